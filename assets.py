@@ -0,0 +1,196 @@
+"""Carga de imagens e sons em segundo plano, com handles pre-resolvidos.
+
+Na abertura do jogo o AssetManager manda ler e decodificar tudo de
+images/ e sounds/ num pool de threads, enquanto o menu ja aparece. Depois
+disso o jogo so pega recursos prontos pelo nome:
+
+* imagens: a Surface decodificada eh convertida para o formato do display
+  no primeiro uso (na thread principal); se ainda nao tiver chegado, espera
+  so por ela e conta em `stalls`;
+* sons: `sound(nome)` devolve um handle criado no start() e resolvido
+  (Sound pronto) quando a carga termina, ainda no menu; antes disso tocar
+  eh um no-op (nunca espera o disco);
+* musica: o mp3 eh lido em memoria no fundo e entregue ao mixer uma vez.
+
+    python assets.py        # mede o tempo de carga de tudo (sem janela)
+"""
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pygame
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+SOUND_EXTS = (".wav", ".ogg")
+MUSIC_FILE = "background.mp3"
+LOAD_WORKERS = 4
+# Meta do tempo ate o primeiro frame do menu (a partir do inicio do game.py)
+STARTUP_TARGET_MS = 500
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class SoundHandle:
+    """Som resolvido uma vez; play() nunca bloqueia nem levanta erro."""
+    def __init__(self, future=None):
+        self.future = future
+        self.sound = None
+
+    def resolve(self):
+        """Troca o Future pelo Sound, se ja carregou; devolve o Sound (ou None)."""
+        future = self.future
+        if future is not None and future.done():
+            self.future = None
+            if future.exception() is None:
+                self.sound = future.result()
+        return self.sound
+
+    def play(self):
+        sound = self.sound
+        if sound is None:
+            sound = self.resolve()
+            if sound is None:
+                return
+        sound.play()
+
+NULL_SOUND = SoundHandle()
+
+
+class AssetManager:
+    """Pre-carrega images/ e sounds/ num pool de threads; acesso por nome."""
+    def __init__(self, root=ROOT, workers=LOAD_WORKERS):
+        self.root = root
+        self.workers = workers
+        self.executor = None
+        self.pending = {}   # nome -> Future(Surface decodificada)
+        self.images = {}    # nome -> Surface pronta para blit
+        self.sounds = {}    # nome -> SoundHandle
+        self.music = None   # Future(bytes do mp3)
+        self.music_loaded = False
+        self.stalls = 0     # imagens pedidas antes de terminarem de carregar
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        """Dispara a carga de tudo em segundo plano (so na primeira chamada)."""
+        if self.executor is not None:
+            return
+        self.started_at = time.perf_counter()
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="assets")
+        image_dir = os.path.join(self.root, "images")
+        for fname in sorted(os.listdir(image_dir)) if os.path.isdir(image_dir) else ():
+            name, ext = os.path.splitext(fname)
+            if ext.lower() in IMAGE_EXTS:
+                self.pending[name] = self.executor.submit(pygame.image.load, os.path.join(image_dir, fname))
+        sound_dir = os.path.join(self.root, "sounds")
+        mixer_ok = pygame.mixer.get_init() is not None
+        for fname in sorted(os.listdir(sound_dir)) if os.path.isdir(sound_dir) else ():
+            name, ext = os.path.splitext(fname)
+            path = os.path.join(sound_dir, fname)
+            if fname == MUSIC_FILE:
+                self.music = self.executor.submit(_read_bytes, path)
+            elif mixer_ok and ext.lower() in SOUND_EXTS:
+                self.sounds[name] = SoundHandle(self.executor.submit(pygame.mixer.Sound, path))
+
+    def futures(self):
+        out = list(self.pending.values())
+        out += [h.future for h in self.sounds.values() if h.future is not None]
+        if self.music is not None:
+            out.append(self.music)
+        return out
+
+    def done(self):
+        """True quando tudo ja foi lido e decodificado (e os sons ja resolvidos)."""
+        if self.finished_at is None and all(f.done() for f in self.futures()):
+            # Ainda no menu: o primeiro play() de cada som ja encontra o Sound pronto
+            for handle in self.sounds.values():
+                handle.resolve()
+            self.finished_at = time.perf_counter()
+        return self.finished_at is not None
+
+    def progress(self):
+        """Fracao (0..1) dos arquivos ja carregados."""
+        futures = self.futures()
+        total = len(futures) + len(self.images)
+        if not total:
+            return 1.0
+        return (sum(f.done() for f in futures) + len(self.images)) / total
+
+    def wait(self):
+        """Bloqueia ate o fim da carga (ex.: ao sair do menu)."""
+        self.start()
+        wait(self.futures())
+        self.done()
+
+    def load_ms(self):
+        """Tempo total da carga em segundo plano (None se ainda nao acabou)."""
+        if not self.done() or self.started_at is None:
+            return None
+        return (self.finished_at - self.started_at) * 1e3
+
+    def image(self, name):
+        """Surface pronta de images/<name>; carrega na hora se nunca foi pedida."""
+        surf = self.images.get(name)
+        if surf is not None:
+            return surf
+        future = self.pending.pop(name, None)
+        if future is None:
+            surf = pygame.image.load(self.image_path(name))
+        else:
+            if not future.done():
+                self.stalls += 1
+            surf = future.result()
+        # convert_alpha precisa do display e da thread principal
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha()
+        self.images[name] = surf
+        return surf
+
+    def image_path(self, name):
+        for ext in IMAGE_EXTS:
+            path = os.path.join(self.root, "images", name + ext)
+            if os.path.exists(path):
+                return path
+        raise KeyError(f"imagem nao encontrada: {name}")
+
+    def sound(self, name):
+        """Handle do som sounds/<name> (um handle mudo se nao existir)."""
+        return self.sounds.get(name, NULL_SOUND)
+
+    def play_music(self, volume=0.5):
+        """Toca a musica em loop; o arquivo so vai para o mixer uma vez."""
+        if not self.music_loaded:
+            if self.music is None or not self.music.done():
+                return False
+            pygame.mixer.music.load(io.BytesIO(self.music.result()), MUSIC_FILE)
+            self.music_loaded = True
+        if not pygame.mixer.music.get_busy():
+            pygame.mixer.music.play(-1)
+            pygame.mixer.music.set_volume(volume)
+        return True
+
+    def stats(self):
+        return {"images": len(self.images) + len(self.pending), "sounds": len(self.sounds),
+                "stalls": self.stalls, "load_ms": self.load_ms()}
+
+ASSETS = AssetManager()
+
+
+def main():
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.mixer.init()
+    ASSETS.start()
+    ASSETS.wait()
+    for name in list(ASSETS.pending):
+        ASSETS.image(name)
+    print(ASSETS.stats())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,533 @@
+"""Benchmarks headless de simulacao, colisao, projeteis, broad-phase, entidades, streaming, servidor, ambiente vetorizado, desenho, abertura e nav.
+
+Roda sem janela nem audio (drivers dummy do SDL) e com seeds fixas. Cada
+cenario mede o melhor de algumas repeticoes; o resultado pode ser salvo
+como baseline e comparado nas proximas execucoes para pegar regressoes.
+
+Tempos e taxas dependem da maquina (e da carga dela no momento), entao
+um laco de calibracao fixo (calibrate) roda antes e depois de cada
+cenario e cada resultado guarda a mediana dessas amostras: na comparacao
+os tempos do baseline sao escalados pela razao entre as calibracoes do
+mesmo cenario. Contagens (blits, bytes, inimigos) sao comparadas direto.
+Um cenario so conta como regressao se continuar fora da tolerancia em
+RETRIES medicoes novas.
+
+    python bench.py --save            # grava bench_baseline.json
+    python bench.py                   # compara com o baseline (sai 1 se piorou)
+    python bench.py --quick --save    # --quick tem baseline proprio (bench_baseline_quick.json)
+    python bench.py --only collision  # so os cenarios com esse prefixo
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+import engine
+from engine import (Game, InputState, ProjectilePool, CollisionGrid, FIXED_DT, WIDTH, HEIGHT, BLOCK_SIZE,
+                    PROJ_FIREBALL, PROJECTILE_SIZE, BODY_ENEMY, BODY_PROJECTILE)
+from level import Level
+from assets import STARTUP_TARGET_MS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "bench_baseline.json")
+# Com menos ticks o custo medio muda (aquecimento, outro trecho do percurso): baseline separado
+QUICK_BASELINE_PATH = os.path.join(HERE, "bench_baseline_quick.json")
+TOLERANCE = 0.25  # Piorar mais que 25% conta como regressao
+CALIBRATION_SAMPLES = 5  # Amostras de calibracao antes e depois de cada cenario
+RETRIES = 2  # Medicoes extras de um cenario que piorou, antes de acusar regressao
+
+
+def synthetic_rows(cols, rows, enemies=0, seed=0):
+    """Mapa ASCII sintetico: bordas, plataformas aleatorias, spawn, princesa e inimigos."""
+    rng = random.Random(seed)
+    grid = [[" "] * cols for _ in range(rows)]
+    for c in range(cols):
+        grid[0][c] = grid[rows - 1][c] = "W"
+    for r in range(rows):
+        grid[r][0] = grid[r][cols - 1] = "W"
+    for r in range(3, rows - 4, 3):  # Deixa livre o alto do spawn
+        c = 1
+        while c < cols - 1:
+            length = rng.randint(2, 6)
+            if rng.random() < 0.5:
+                for cc in range(c, min(c + length, cols - 1)):
+                    grid[r][cc] = "P"
+            c += length + rng.randint(1, 4)
+    grid[rows - 2][1] = "C"
+    grid[1][cols - 2] = "K"
+    free = [(r, c) for r in range(1, rows - 2) for c in range(1, cols - 1) if grid[r][c] == " "]
+    for r, c in rng.sample(free, min(enemies, len(free))):
+        grid[r][c] = rng.choice("FS")
+    return ["".join(row) for row in grid]
+
+def synthetic_level(cols, rows, enemies=0, seed=0):
+    return Level.from_rows(synthetic_rows(cols, rows, enemies, seed), f"bench {cols}x{rows}")
+
+def scripted_input(i):
+    """Entrada fixa e barata: vai e volta, pulando de vez em quando."""
+    return InputState(left=(i // 90) % 2 == 1, right=(i // 90) % 2 == 0, space=i % 45 == 0)
+
+INPUTS = [scripted_input(i) for i in range(360)]
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def _calibration_work():
+    # Mistura do que os cenarios fazem: laco Python com floats e dicts, e NumPy pequeno
+    acc = 0.0
+    cells = {}
+    for i in range(40_000):
+        acc += (i * 0.5) % 7
+        cells[i & 1023] = acc
+    a = np.arange(10_000, dtype=np.float64)
+    for _ in range(40):
+        a = (a * 1.0001 + 0.5) % 1000.0
+    return acc, a
+
+def calibrate(samples=CALIBRATION_SAMPLES):
+    """Ms de cada uma de `samples` execucoes do laco fixo de calibracao."""
+    out = []
+    for _ in range(samples):
+        t = time.perf_counter()
+        _calibration_work()
+        out.append((time.perf_counter() - t) * 1e3)
+    return out
+
+def is_timed(unit):
+    """Se a metrica eh um tempo ou uma taxa (depende da velocidade da maquina)."""
+    return unit.startswith(("ms", "us")) or "/s" in unit
+
+
+# --- CENARIOS ---
+
+def bench_sim(enemies, ticks, repeat):
+    """Ticks por segundo do Game completo com N inimigos."""
+    level = synthetic_level(20, 15, enemies, seed=enemies) if enemies != 2 else None
+
+    def run():
+        game = Game(seed=1, level=level)
+        game.start()
+        for i in range(ticks):
+            if game.state != engine.STATE_PLAYING:
+                game.start()
+            game.step(INPUTS[i % 360])
+    return {"value": ticks / best_of(run, repeat), "unit": "ticks/s", "higher_is_better": True}
+
+def bench_collision(cols, rows, ticks, repeat):
+    """Custo da colisao de tiles do player (us por tick) num mapa cols x rows."""
+    game = Game(seed=1, level=synthetic_level(cols, rows))
+    game.start()
+    player = game.player
+    start = (player.x, player.y)
+
+    def run():
+        player.x, player.y, player.vy = start[0], start[1], 0
+        for i in range(ticks):
+            game.input = INPUTS[i % 360]
+            player.update(FIXED_DT, game)
+    return {"value": best_of(run, repeat) / ticks * 1e6, "unit": "us/tick", "higher_is_better": False}
+
+def bench_projectiles(count, ticks, repeat):
+    """Update + teste contra o player de N projeteis (us por tick)."""
+    rng = random.Random(count)
+    pool = ProjectilePool()
+    for _ in range(count):
+        pool.spawn(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), rng.choice((-5, 5)), PROJ_FIREBALL)
+    far = pygame.Rect(-10_000, -10_000, 30, 50)
+
+    def run():
+        for _ in range(ticks):
+            pool.update(-1e12, 1e12)
+            pool.hits(far)
+    return {"value": best_of(run, repeat) / ticks * 1e6, "unit": "us/tick", "higher_is_better": False}
+
+def bench_grid(count, ticks, repeat):
+    """Broad-phase de N inimigos contra N projeteis num mundo 4000x4000 (us por tick)."""
+    rng = random.Random(count)
+    enemies = [(i, rng.randrange(4000), rng.randrange(4000)) for i in range(count)]
+    shots = [(i, rng.randrange(4000), rng.randrange(4000)) for i in range(count)]
+    grid = CollisionGrid()
+
+    def run():
+        for _ in range(ticks):
+            grid.clear()
+            grid.insert_all(BODY_ENEMY, enemies, 40, 40)
+            grid.insert_all(BODY_PROJECTILE, shots, PROJECTILE_SIZE, PROJECTILE_SIZE)
+            grid.pairs(BODY_ENEMY, BODY_PROJECTILE)
+    return {"value": best_of(run, repeat) / ticks * 1e6, "unit": "us/tick", "higher_is_better": False}
+
+_display_ready = False
+
+def _init_display():
+    global _display_ready
+    if not _display_ready:
+        from pgzero import loaders
+        pygame.display.init()
+        pygame.font.init()
+        pygame.display.set_mode((WIDTH, HEIGHT))
+        loaders.set_root(os.path.join(HERE, "game.py"))
+        _display_ready = True
+
+def bench_draw(enemies, frames, repeat):
+    """Tempo de um frame do Renderer (ms) e blits por frame com N inimigos."""
+    _init_display()
+    from render import Renderer
+    level = synthetic_level(20, 15, enemies, seed=enemies) if enemies != 2 else None
+    game = Game(seed=1, level=level)
+    game.start()
+    for i in range(240):  # Deixa os inimigos atirarem um pouco
+        if game.state != engine.STATE_PLAYING:
+            game.start()
+        game.step(INPUTS[i % 360])
+    renderer = Renderer()
+    renderer.draw(game)  # Aquece atlas, textos e camada do nivel
+
+    def run():
+        for _ in range(frames):
+            renderer.draw(game)
+    ms = best_of(run, repeat) / frames * 1e3
+    return [
+        {"value": ms, "unit": "ms/frame", "higher_is_better": False},
+        {"value": renderer.draw_calls, "unit": "blits/frame", "higher_is_better": False},
+    ]
+
+def bench_crowd(cols, rows, ticks, repeat):
+    """Ticks/s e updates de IA por tick num mapa lotado (1 inimigo a cada 8 celulas)."""
+    game = Game(seed=1, level=synthetic_level(cols, rows, cols * rows // 8, seed=cols))
+    game.start()
+    updates = []
+
+    def run():
+        updates.clear()
+        for i in range(ticks):
+            if game.state != engine.STATE_PLAYING:
+                game.start()
+            game.step(INPUTS[i % 360])
+            updates.append(game.ai.updated)
+    tps = ticks / best_of(run, repeat)
+    return [
+        {"value": tps, "unit": "ticks/s", "higher_is_better": True},
+        {"value": sum(updates) / len(updates), "unit": "ai updates/tick", "higher_is_better": False},
+    ]
+
+def bench_world(cols, rows, ticks, repeat):
+    """Ticks/s e ms por frame num mapa cols x rows com densidade fixa de inimigos.
+
+    Com a camera e o culling os dois devem ficar estaveis com o tamanho do mapa.
+    """
+    _init_display()
+    from render import Renderer
+    game = Game(seed=1, level=synthetic_level(cols, rows, cols * rows // 100, seed=cols))
+    game.start()
+    renderer = Renderer()
+    target = pygame.Surface((WIDTH, HEIGHT))
+
+    def sim():
+        for i in range(ticks):
+            if game.state != engine.STATE_PLAYING:
+                game.start()
+            game.step(INPUTS[i % 360])
+
+    def draw():
+        for i in range(ticks // 10):
+            if game.state != engine.STATE_PLAYING:
+                game.start()
+            game.step(INPUTS[i % 360])
+            renderer.draw(game, target)
+    tps = ticks / best_of(sim, repeat)
+    ms = best_of(draw, repeat) / (ticks // 10) * 1e3
+    return [
+        {"value": tps, "unit": "ticks/s", "higher_is_better": True},
+        {"value": ms, "unit": "ms/frame", "higher_is_better": False},
+    ]
+
+def bench_stream(cols, rows, ticks, repeat):
+    """Abertura (ms) e ticks/s varrendo uma torre cols x rows, com e sem streaming por chunks.
+
+    Com streaming a abertura e os inimigos carregados nao crescem com o mapa.
+    """
+    level = synthetic_level(cols, rows, cols * rows // 100, seed=rows)
+    out = []
+    for stream, tag in ((True, "stream"), (False, "full")):
+        games = []
+
+        def start():
+            game = Game(seed=1, level=level, stream=stream)
+            game.start()
+            games.append(game)
+        start_ms = best_of(start, repeat) * 1e3
+        game = games[-1]
+        loaded = []
+
+        def sweep():
+            # Atravessa a torre de baixo para cima (a camera cruza chunks o tempo todo)
+            p = game.player
+            for i in range(ticks):
+                p.x = 60 + (i * 6) % (cols * BLOCK_SIZE - 120)
+                p.y = rows * BLOCK_SIZE - 100 - (i * 12) % (rows * BLOCK_SIZE - 200)
+                p.vy = 0
+                p.lives = 99
+                game.step(INPUTS[0])
+                loaded.append(len(game.enemies))
+        tps = ticks / best_of(sweep, repeat)
+        out += [
+            {"value": start_ms, "unit": f"ms to start ({tag})", "higher_is_better": False},
+            {"value": tps, "unit": f"ticks/s ({tag})", "higher_is_better": True},
+        ]
+        if stream:
+            out.append({"value": max(loaded), "unit": "max enemies loaded", "higher_is_better": False})
+    return out
+
+def bench_entities(count, repeat):
+    """Bytes por inimigo e restarts por segundo de um nivel 100x100 com N inimigos."""
+    rng = random.Random(count)
+    spots = [(rng.randrange(4000), rng.randrange(4000)) for _ in range(count)]
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    enemies = [engine.FireEnemy(x, y, (x - 20, x + 20)) for x, y in spots]
+    per_enemy = (tracemalloc.get_traced_memory()[0] - base) / count
+    tracemalloc.stop()
+    del enemies
+    game = Game(seed=1, level=synthetic_level(100, 100, count, seed=count))
+    game.start()
+    restarts = 10
+
+    def run():
+        for _ in range(restarts):
+            game.start()
+    return [
+        {"value": per_enemy, "unit": "bytes/enemy", "higher_is_better": False},
+        {"value": restarts / best_of(run, repeat), "unit": "restarts/s", "higher_is_better": True},
+    ]
+
+def bench_server(sessions, ticks, repeat):
+    """Custo de um tick do server.py (passo + deltas) com N sessoes, sem socket (us por sessao)."""
+    import server
+
+    class NullWriter:
+        class transport:
+            @staticmethod
+            def get_write_buffer_size(): return 0
+        def write(self, data): pass
+    srv = server.Server()
+    conn = server.Connection(NullWriter())
+    srv.connections.add(conn)
+    ids = [srv.open(i, conn) for i in range(sessions)]
+    rng = random.Random(sessions)
+
+    def run():
+        for i in range(ticks):
+            if i % 20 == 0:
+                for sid in ids:
+                    srv.push_input(sid, rng.randrange(8))
+            srv.step_all()
+            srv.flush()
+    return {"value": best_of(run, repeat) / ticks / sessions * 1e6, "unit": "us/session", "higher_is_better": False}
+
+def bench_vecenv(envs, ticks, repeat):
+    """Env-steps por segundo do vecenv.py (N copias do level1, acoes aleatorias)."""
+    from vecenv import VecEnv
+    env = VecEnv(envs)
+    actions = np.random.default_rng(envs).integers(0, 8, (ticks, envs))
+
+    def run():
+        for a in actions:
+            env.step(a)
+    return {"value": envs * ticks / best_of(run, repeat), "unit": "env-steps/s", "higher_is_better": True}
+
+def bench_nav(count, edits, repeat):
+    """Niveis 20x15 validados por segundo (nav.py) e ms por edicao de tile num mapa 100x50."""
+    from nav import LevelNav
+    levels = [synthetic_level(20, 15, 4, seed=i) for i in range(count)]
+    big = LevelNav(synthetic_level(100, 50, seed=1))
+    rng = random.Random(1)
+    cells = [(rng.randrange(1, 99), rng.randrange(1, 49), rng.choice((0, 2))) for _ in range(edits)]
+
+    def check():
+        for level in levels:
+            LevelNav(level).check()
+
+    def edit():
+        for col, row, code in cells:
+            big.set_tile(col, row, code)
+        big.check()
+    return [
+        {"value": count / best_of(check, repeat), "unit": "levels/s", "higher_is_better": True},
+        {"value": best_of(edit, repeat) / edits * 1e3, "unit": "ms/edit", "higher_is_better": False},
+    ]
+
+# Abertura do jogo num processo novo (imports frios), na mesma ordem do game.py
+STARTUP_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import pygame
+pygame.init()
+from assets import ASSETS
+ASSETS.start()
+from engine import WIDTH, HEIGHT, Game
+from render import Renderer
+pygame.display.set_mode((WIDTH, HEIGHT))
+Renderer().draw(Game())
+first = (time.perf_counter() - t0) * 1e3
+ASSETS.wait()
+print(first, ASSETS.load_ms(), ASSETS.stalls)
+"""
+
+def bench_startup(repeat):
+    """Ms ate o primeiro frame do menu e ms ate o fim da carga de imagens e sons."""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+               PYGAME_HIDE_SUPPORT_PROMPT="1")
+    first, loaded = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=HERE, env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        first.append(float(out[-3]))
+        loaded.append(float(out[-2]))
+    return [
+        {"value": min(first), "unit": "ms to menu", "higher_is_better": False},
+        {"value": min(loaded), "unit": "ms assets", "higher_is_better": False},
+    ]
+
+def scenarios(quick=False):
+    """(nome, funcao) de cada cenario; quick reduz iteracoes e o maior mapa."""
+    k = 0.2 if quick else 1.0
+    n = lambda x: max(1, int(x * k))
+    repeat = 2 if quick else 3
+    out = []
+    for enemies in (2, 20, 200):
+        out.append((f"sim/enemies={enemies}", lambda e=enemies: bench_sim(e, n(3000), repeat)))
+    sizes = [(20, 15), (100, 100), (1000, 1000)]
+    for cols, rows in sizes[:2] if quick else sizes:
+        out.append((f"collision/{cols}x{rows}", lambda c=cols, r=rows: bench_collision(c, r, n(5000), repeat)))
+    for count in (10, 100, 1000, 10000):
+        out.append((f"projectiles/n={count}", lambda c=count: bench_projectiles(c, n(500), repeat)))
+    for count in (100, 1000, 10000):
+        out.append((f"grid/n={count}", lambda c=count: bench_grid(c, n(50), repeat)))
+    for enemies in (2, 50, 150):
+        out.append((f"draw/enemies={enemies}", lambda e=enemies: bench_draw(e, n(200), repeat)))
+    for cols, rows in sizes[:2] if quick else sizes:
+        out.append((f"world/{cols}x{rows}", lambda c=cols, r=rows: bench_world(c, r, n(2000), repeat)))
+    if not quick:
+        out.append(("stream/400x2500", lambda: bench_stream(400, 2500, n(3000), repeat)))
+    out.append(("entities/n=10000", lambda: bench_entities(10000, repeat)))
+    out.append(("crowd/100x100", lambda: bench_crowd(100, 100, n(2000), repeat)))
+    out.append(("server/sessions=1000", lambda: bench_server(1000, n(60), repeat)))
+    out.append(("vecenv/envs=4096", lambda: bench_vecenv(4096, n(100), repeat)))
+    out.append(("nav", lambda: bench_nav(n(50), n(20), repeat)))
+    out.append(("startup", lambda: bench_startup(repeat)))
+    return out
+
+def measure(name, fn):
+    """Resultados de um cenario, cada um com a calibracao (mediana, ms) medida em volta dele."""
+    before = calibrate()
+    res = fn()
+    cal = statistics.median(before + calibrate())
+    out = {}
+    for r in res if isinstance(res, list) else [res]:
+        r["calibration"] = cal
+        out[f"{name} [{r['unit']}]"] = r
+    return out
+
+def run_all(only=None, quick=False, names=None):
+    """Roda os cenarios com o prefixo `only` (ou so os de `names`)."""
+    results = {}
+    for name, fn in scenarios(quick):
+        if only and not name.startswith(only) or names is not None and name not in names:
+            continue
+        for key, r in measure(name, fn).items():
+            results[key] = r
+            print(f"{key:45s} {r['value']:14.3f}", flush=True)
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Lista (nome, esperado, atual, variacao) dos resultados que pioraram alem da tolerancia.
+
+    O esperado dos tempos e taxas eh o valor do baseline levado para a
+    velocidade da maquina durante o cenario, pela razao entre as calibracoes
+    dele; resultados sem calibracao num dos lados so comparam contagens.
+    """
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base or not base["value"]:
+            continue
+        expected = base["value"]
+        if is_timed(r["unit"]):
+            if not base.get("calibration") or not r.get("calibration"):
+                continue
+            scale = r["calibration"] / base["calibration"]
+            # Maquina 2x mais lenta: tempos dobram e taxas caem pela metade
+            expected = expected / scale if r["higher_is_better"] else expected * scale
+        change = (r["value"] - expected) / expected
+        worse = -change if r["higher_is_better"] else change
+        if worse > tolerance:
+            regressions.append((key, expected, r["value"], change))
+    return regressions
+
+def confirm(regressions, baseline, quick, tolerance=TOLERANCE, retries=RETRIES):
+    """Mede de novo os cenarios que pioraram; fica so o que piorou em todas as tentativas."""
+    for _ in range(retries):
+        if not regressions:
+            break
+        names = {key.rsplit(" [", 1)[0] for key, *_ in regressions}
+        print(f"medindo de novo: {', '.join(sorted(names))}", flush=True)
+        again = {key for key, *_ in compare(run_all(quick=quick, names=names), baseline, tolerance)}
+        regressions = [reg for reg in regressions if reg[0] in again]
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks headless do Save The Princess.")
+    parser.add_argument("--save", action="store_true", help="grava os resultados como baseline")
+    parser.add_argument("--baseline", default=None, help="padrao: bench_baseline.json (ou _quick com --quick)")
+    parser.add_argument("--only", default=None, help="prefixo dos cenarios (ex.: sim, draw)")
+    parser.add_argument("--quick", action="store_true", help="menos iteracoes, sem o mapa 1000x1000")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+    if args.baseline is None:
+        args.baseline = QUICK_BASELINE_PATH if args.quick else BASELINE_PATH
+
+    results = run_all(args.only, args.quick)
+    startup = results.get("startup [ms to menu]")
+    if startup and startup["value"] > STARTUP_TARGET_MS:
+        print(f"ACIMA DA META startup: {startup['value']:.0f} ms (meta {STARTUP_TARGET_MS} ms)")
+        return 1
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline gravado em {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("sem baseline para comparar (use --save)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if not any("calibration" in r for r in baseline.values()):
+        print("baseline sem calibracao: so as contagens sao comparadas (grave de novo com --save)")
+    regressions = confirm(compare(results, baseline, args.tolerance), baseline, args.quick, args.tolerance)
+    for key, base, cur, change in regressions:
+        print(f"REGRESSAO {key}: {base:.3f} -> {cur:.3f} ({change:+.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
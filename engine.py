@@ -0,0 +1,1484 @@
+"""Nucleo da simulacao do Save The Princess (headless).
+
+Toda a logica do jogo vive aqui, sem janela, audio ou Actor: a entrada e o
+relogio sao injetados. O game.py (pgzero) apenas desenha e toca os sons.
+
+Uso sem janela:
+
+    game = Game(seed=1)
+    game.start()
+    for _ in range(10000):
+        game.step(InputState(right=True))
+"""
+import abc
+import os
+import random
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pygame  # Apenas pygame.Rect (nao abre display)
+
+# --- CONFIGURAÇÃO GERAL ---
+WIDTH = 800
+HEIGHT = 600
+BLOCK_SIZE = 40  # Tamanho do grid
+
+# Nivel padrao (ver level.py para o formato)
+DEFAULT_LEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "level1.txt")
+
+# Passo fixo da simulacao: as constantes de movimento sao "por tick" a 60 Hz
+FIXED_DT = 1 / 60
+MAX_STEPS_PER_UPDATE = 5  # Evita espiral quando o render fica muito lento
+
+# Camera e culling: so o que esta na tela (mais a margem) eh atualizado
+CHUNK_SIZE = BLOCK_SIZE * 8  # Lado dos blocos do indice de inimigos (px)
+UPDATE_MARGIN = BLOCK_SIZE * 4  # Folga em volta da tela para inimigos e projeteis
+PATROL_RADIUS = BLOCK_SIZE * 4  # Inimigos andam no maximo isso para cada lado do spawn
+
+# Streaming: niveis grandes carregam os inimigos por chunk (ver WorldStream)
+STREAM_MIN_CELLS = 250_000  # A partir de quantos tiles o nivel eh carregado por chunks
+# Chunks que tocam a tela com essa folga ficam ativos; cobre a area ativa
+# arredondada para os blocos do ChunkIndex, entao nada perto da tela falta
+STREAM_LOAD_MARGIN = UPDATE_MARGIN + CHUNK_SIZE
+STREAM_KEEP_MARGIN = STREAM_LOAD_MARGIN + BLOCK_SIZE * 8      # So descarrega alem disso
+STREAM_PREFETCH_MARGIN = STREAM_KEEP_MARGIN + BLOCK_SIZE * 8  # A thread prepara ate aqui
+
+# Colisao entre entidades: broad-phase em grid uniforme para pares muitos-contra-muitos
+GRID_CELL = BLOCK_SIZE * 2  # Lado da celula (px)
+BODY_PLAYER = 0
+BODY_PRINCESS = 1
+BODY_ENEMY = 2
+BODY_PROJECTILE = 3
+BODY_KINDS = 4
+
+# Física (Ajustável)
+GRAVITY = 0.6
+CARRY_GRAVITY_SCALE = 1.3  # Carregando a princesa: mais peso e menos velocidade
+CARRY_SPEED_SCALE = 0.7
+GRAVITY_CARRYING = GRAVITY * CARRY_GRAVITY_SCALE
+PLAYER_SPEED = 4
+PLAYER_SPEED_CARRYING = PLAYER_SPEED * CARRY_SPEED_SCALE
+JUMP_STRENGTH = -12
+
+# Estados
+STATE_MENU = "MENU"
+STATE_PLAYING = "PLAYING"
+STATE_GAME_OVER = "GAME_OVER"
+STATE_VICTORY = "VICTORY"
+
+# Tipos de tile (codigos do indice de colisao)
+TILE_EMPTY = 0
+TILE_WALL = 1      # W
+TILE_PLATFORM = 2  # P
+TILE_CASTLE = 3    # C
+TILE_CODES = {"W": TILE_WALL, "P": TILE_PLATFORM, "C": TILE_CASTLE}
+
+# Projeteis (tipos do pool e imagem de cada um)
+PROJ_FIREBALL = 0
+PROJ_SWORD = 1
+PROJECTILE_IMAGES = ("fireball", "sword")
+PROJECTILE_SIZE = 20  # Hitbox quadrada
+# Ate quantos projeteis vivos o ProjectilePool testa em Python: com poucos, o custo
+# fixo de cada operacao do NumPy passa o do laco (pesa no server.py, com muitas sessoes)
+SMALL_POOL = 8
+
+# Entidades do nivel (codigos do arquivo compilado, ver level.py)
+ENT_PRINCESS = 1  # K
+ENT_FIRE = 2      # F
+ENT_SWORD = 3     # S
+ENTITY_CODES = {"K": ENT_PRINCESS, "F": ENT_FIRE, "S": ENT_SWORD}
+
+# --- ENTRADA E AUDIO INJETADOS ---
+class InputState:
+    """Teclas de um tick. Mesmos nomes do `keyboard` do pgzero, que pode ser usado no lugar."""
+    def __init__(self, left=False, right=False, space=False):
+        self.left = left
+        self.right = right
+        self.space = space
+
+class NullAudio:
+    """Audio mudo, usado na simulacao headless."""
+    def play_sfx(self, name): pass
+    def play_bgm(self): pass
+    def stop_bgm(self): pass
+
+# --- INDICE DE TILES ---
+class TileGrid:
+    """Indice do mapa: um codigo de tile por celula de BLOCK_SIZE.
+
+    A colisao consulta so as celulas que a hitbox sobrepoe, em vez de
+    percorrer todos os blocos do nivel.
+    """
+    def __init__(self, cols, rows, cells):
+        self.cols = cols
+        self.rows = rows
+        self.cells = cells  # bytes/bytearray/memoryview, linha a linha
+        self.version = 0    # Muda a cada set_tile (cache do render, nav.py)
+
+    @classmethod
+    def from_rows(cls, level_map):
+        """Monta o indice direto de um grid ASCII (lista de strings)."""
+        rows = len(level_map)
+        cols = max(len(row) for row in level_map) if level_map else 0
+        cells = bytearray(rows * cols)
+        for r, row in enumerate(level_map):
+            base = r * cols
+            for c, char in enumerate(row):
+                cells[base + c] = TILE_CODES.get(char, TILE_EMPTY)
+        return cls(cols, rows, cells)
+
+    def tile_at(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.cells[row * self.cols + col]
+        return TILE_EMPTY
+
+    def set_tile(self, col, row, code):
+        """Edita um tile; na primeira edicao copia o grid se ele for somente leitura (mmap)."""
+        if not isinstance(self.cells, bytearray):
+            self.cells = bytearray(self.cells)
+        self.cells[row * self.cols + col] = code
+        self.version += 1
+
+    def floor_span(self, col, row):
+        """(primeira, ultima) coluna do chao continuo sob a celula, ou None se ela nao tem chao."""
+        def standable(c):
+            return self.tile_at(c, row) == TILE_EMPTY and self.tile_at(c, row + 1) != TILE_EMPTY
+        if not (0 <= col < self.cols) or not standable(col):
+            return None
+        c0 = c1 = col
+        while c0 > 0 and standable(c0 - 1): c0 -= 1
+        while c1 < self.cols - 1 and standable(c1 + 1): c1 += 1
+        return c0, c1
+
+    def solids_in(self, rect):
+        """Rects dos tiles solidos que o rect sobrepoe (linha a linha)."""
+        c0 = max(rect.left // BLOCK_SIZE, 0)
+        c1 = min((rect.right - 1) // BLOCK_SIZE, self.cols - 1)
+        r0 = max(rect.top // BLOCK_SIZE, 0)
+        r1 = min((rect.bottom - 1) // BLOCK_SIZE, self.rows - 1)
+        hits = []
+        for r in range(r0, r1 + 1):
+            base = r * self.cols
+            for c in range(c0, c1 + 1):
+                if self.cells[base + c] != TILE_EMPTY:
+                    hits.append(pygame.Rect(c * BLOCK_SIZE, r * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
+        return hits
+
+# --- CAMERA ---
+class Camera:
+    """Janela de WIDTH x HEIGHT sobre o mundo, centrada no player e presa nas bordas."""
+    def __init__(self, w=WIDTH, h=HEIGHT):
+        self.x = 0
+        self.y = 0
+        self.w = w
+        self.h = h
+
+    def follow(self, x, y, world_w, world_h):
+        self.x = int(min(max(x - self.w // 2, 0), world_w - self.w))
+        self.y = int(min(max(y - self.h // 2, 0), world_h - self.h))
+
+    def rect(self, margin=0):
+        """Area vista em coordenadas do mundo, com `margin` px de folga."""
+        return pygame.Rect(self.x - margin, self.y - margin, self.w + 2 * margin, self.h + 2 * margin)
+
+class ChunkIndex:
+    """Indices de entidades agrupados por bloco de CHUNK_SIZE px do mundo.
+
+    Consultar uma area so visita os blocos que ela cobre, entao o total de
+    entidades no mapa nao pesa no custo por frame.
+    """
+    def __init__(self, size=CHUNK_SIZE):
+        self.size = size
+        self.chunks = {}  # (cx, cy) -> set de indices
+        self.where = {}   # indice -> (cx, cy)
+        self.version = 0  # Muda sempre que alguma entidade troca de bloco
+        self._last_query = None  # (blocos consultados, versao, resultado)
+
+    def place(self, i, x, y):
+        """Insere ou move a entidade `i` para o bloco de (x, y)."""
+        key = (int(x // self.size), int(y // self.size))
+        old = self.where.get(i)
+        if old == key: return
+        if old is not None:
+            bucket = self.chunks[old]
+            bucket.discard(i)
+            if not bucket: del self.chunks[old]
+        self.chunks.setdefault(key, set()).add(i)
+        self.where[i] = key
+        self.version += 1
+
+    def remove(self, i):
+        """Tira a entidade `i` do indice (inimigo descarregado)."""
+        key = self.where.pop(i)
+        bucket = self.chunks[key]
+        bucket.discard(i)
+        if not bucket: del self.chunks[key]
+        self.version += 1
+
+    def query(self, rect):
+        """Indices (em ordem crescente) das entidades nos blocos que `rect` toca.
+
+        Repete o resultado anterior se a area cobre os mesmos blocos e nada mudou de bloco.
+        """
+        size = self.size
+        span = (rect.left // size, (rect.right - 1) // size, rect.top // size, (rect.bottom - 1) // size)
+        last = self._last_query
+        if last is not None and last[0] == span and last[1] == self.version:
+            return last[2]
+        c0, c1, r0, r1 = span
+        found = []
+        for cy in range(r0, r1 + 1):
+            for cx in range(c0, c1 + 1):
+                bucket = self.chunks.get((cx, cy))
+                if bucket: found.extend(bucket)
+        found.sort()
+        self._last_query = (span, self.version, found)
+        return found
+
+# --- PROJETEIS ---
+class ProjectilePool:
+    """Todos os projeteis do nivel em arrays paralelos (struct-of-arrays).
+
+    Os vivos ficam compactados em [0, count). Movimento, descarte fora da
+    tela e teste contra a hitbox do player sao feitos em lote pelo NumPy.
+    Cada projetil recebe um `serial` crescente ao nascer (nunca reaproveitado
+    no mesmo pool), entao quem acompanha o pool de fora ve nascimentos e
+    remocoes sem comparar posicoes.
+    """
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.next_serial = 0
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old = self.count
+        x, y, vx, kind = np.zeros(capacity), np.zeros(capacity), np.zeros(capacity), np.zeros(capacity, np.int8)
+        serial = np.zeros(capacity, np.uint32)
+        if old:
+            x[:old], y[:old], vx[:old], kind[:old] = self.x[:old], self.y[:old], self.vx[:old], self.kind[:old]
+            serial[:old] = self.serial[:old]
+        self.x, self.y, self.vx, self.kind, self.serial = x, y, vx, kind, serial
+        self.alive = np.zeros(capacity, bool)
+        self.alive[:old] = True
+
+    def clear(self):
+        self.alive[:self.count] = False
+        self.count = 0
+
+    def spawn(self, x, y, vx, kind):
+        i = self.count
+        if i == len(self.x):
+            self._alloc(2 * i)
+        self.x[i], self.y[i], self.vx[i], self.kind[i] = x, y, vx, kind
+        self.serial[i] = self.next_serial
+        self.next_serial += 1
+        self.alive[i] = True
+        self.count = i + 1
+
+    def update(self, min_x=0, max_x=WIDTH, min_y=None, max_y=None):
+        """Move todos e descarta os que sairam de [min_x, max_x] (e de [min_y, max_y], se dado)."""
+        n = self.count
+        if not n: return
+        x = self.x[:n]
+        x += self.vx[:n]
+        if n <= SMALL_POOL:
+            xs = x.tolist()
+            out = [i for i, v in enumerate(xs) if not min_x <= v <= max_x]
+            if min_y is not None:
+                out += [i for i, v in enumerate(self.y[:n].tolist()) if not min_y <= v <= max_y]
+            if out:
+                self.alive[out] = False
+                self.compact()
+            return
+        self.alive[:n] &= (x >= min_x) & (x <= max_x)
+        if min_y is not None:
+            y = self.y[:n]
+            self.alive[:n] &= (y >= min_y) & (y <= max_y)
+        self.compact()
+
+    def compact(self):
+        """Remove os mortos mantendo a ordem de criacao dos vivos."""
+        n = self.count
+        alive = self.alive[:n]
+        if alive.all(): return
+        keep = np.flatnonzero(alive)
+        m = len(keep)
+        for arr in (self.x, self.y, self.vx, self.kind, self.serial):
+            arr[:m] = arr[keep]
+        self.alive[:n] = False
+        self.alive[:m] = True
+        self.count = m
+
+    def hits(self, rect):
+        """Marca como mortos os projeteis que tocam `rect`; devolve os tipos deles."""
+        n = self.count
+        if not n: return []
+        if n <= SMALL_POOL:
+            half = PROJECTILE_SIZE // 2
+            l, t, r, b = rect.left - PROJECTILE_SIZE, rect.top - PROJECTILE_SIZE, rect.right, rect.bottom
+            # int() trunca para zero, como o pygame.Rect
+            hit = [i for i, (x, y) in enumerate(zip(self.x[:n].tolist(), self.y[:n].tolist()))
+                   if l < int(x - half) < r and t < int(y - half) < b]
+            if not hit: return []
+            kinds = self.kind[hit].tolist()
+            self.alive[hit] = False
+            self.compact()
+            return kinds
+        # Mesmo arredondamento do pygame.Rect (trunca para zero)
+        left = np.trunc(self.x[:n] - PROJECTILE_SIZE // 2)
+        top = np.trunc(self.y[:n] - PROJECTILE_SIZE // 2)
+        hit = ((left < rect.right) & (left + PROJECTILE_SIZE > rect.left) &
+               (top < rect.bottom) & (top + PROJECTILE_SIZE > rect.top) & self.alive[:n])
+        if not hit.any(): return []
+        kinds = self.kind[:n][hit].tolist()
+        self.alive[:n] &= ~hit
+        self.compact()
+        return kinds
+
+    def to_bytes(self):
+        """Vivos em bytes (snapshot): contagem e os arrays x, y, vx, tipo."""
+        n = self.count
+        return b"".join((struct.pack("<I", n), self.x[:n].tobytes(), self.y[:n].tobytes(),
+                         self.vx[:n].tobytes(), self.kind[:n].tobytes()))
+
+    def load_bytes(self, data, off=0):
+        """Substitui os projeteis pelos de to_bytes(); devolve o offset depois deles."""
+        n, = struct.unpack_from("<I", data, off)
+        off += 4
+        self.clear()
+        if n > len(self.x):
+            self._alloc(n)
+        for arr in (self.x, self.y, self.vx, self.kind):
+            size = n * arr.itemsize
+            arr[:n] = np.frombuffer(data, arr.dtype, n, off)
+            off += size
+        # Os restaurados contam como novos (o serial nao vai no snapshot)
+        self.serial[:n] = np.arange(self.next_serial, self.next_serial + n)
+        self.next_serial += n
+        self.alive[:n] = True
+        self.count = n
+        return off
+
+    def items(self):
+        """(x, y, tipo) de cada projetil vivo, para desenhar."""
+        n = self.count
+        return zip(self.x[:n].tolist(), self.y[:n].tolist(), self.kind[:n].tolist())
+
+# --- COLISAO ENTRE ENTIDADES ---
+class CollisionGrid:
+    """Broad-phase em grid uniforme, com uma camada por tipo de corpo.
+
+    A cada tick as entidades dinamicas entram com sua hitbox (AABB inteira,
+    como o pygame.Rect) e `ref` (o objeto, ou o indice no ProjectilePool).
+    Cada corpo fica so na celula do seu canto superior esquerdo; a consulta
+    alarga a area pelo maior corpo da camada. `pairs` so faz o teste fino
+    entre corpos de celulas vizinhas.
+    """
+    def __init__(self, cell=GRID_CELL):
+        self.cell = cell
+        self.bodies = [[] for _ in range(BODY_KINDS)]  # tipo -> [(ref, l, t, r, b)]
+        self.cells = [None] * BODY_KINDS  # tipo -> {(cx, cy): [indice]}, montado sob demanda
+        self.max_size = [(0, 0)] * BODY_KINDS
+
+    def clear(self):
+        for bodies in self.bodies: bodies.clear()
+        self.cells = [None] * BODY_KINDS
+        self.max_size = [(0, 0)] * BODY_KINDS
+
+    def insert(self, kind, ref, left, top, w, h):
+        self.bodies[kind].append((ref, left, top, left + w, top + h))
+        mw, mh = self.max_size[kind]
+        if w > mw or h > mh:
+            self.max_size[kind] = (max(w, mw), max(h, mh))
+
+    def insert_all(self, kind, boxes, w, h):
+        """Varios corpos de mesmo tamanho: `boxes` eh [(ref, left, top)]."""
+        self.bodies[kind].extend([(ref, l, t, l + w, t + h) for ref, l, t in boxes])
+        mw, mh = self.max_size[kind]
+        self.max_size[kind] = (max(w, mw), max(h, mh))
+
+    def layer(self, kind):
+        cells = self.cells[kind]
+        if cells is None:
+            cells = self.cells[kind] = {}
+            cell = self.cell
+            for i, (_, l, t, _, _) in enumerate(self.bodies[kind]):
+                key = (l // cell, t // cell)
+                bucket = cells.get(key)
+                if bucket is None: cells[key] = [i]
+                else: bucket.append(i)
+        return cells
+
+    def pairs(self, kind_a, kind_b):
+        """(ref_a, ref_b) de cada par que se sobrepoe, na ordem de insercao de a e depois b."""
+        bodies_a, bodies_b = self.bodies[kind_a], self.bodies[kind_b]
+        if not bodies_b or not bodies_a: return []
+        if len(bodies_a) == 1 and kind_a != kind_b:
+            # Um unico corpo consultando (o player): varrer a camada sai mais
+            # barato que montar as celulas dela
+            ref, l, t, r, b = bodies_a[0]
+            return [(ref, ref_b) for ref_b, l2, t2, r2, b2 in bodies_b
+                    if l < r2 and l2 < r and t < b2 and t2 < b]
+        cells_b, cell = self.layer(kind_b), self.cell
+        pad_w, pad_h = self.max_size[kind_b]
+        same = kind_a == kind_b
+        out = []
+        for i, (ref, l, t, r, b) in enumerate(bodies_a):
+            found = []
+            for cy in range((t - pad_h) // cell, (b - 1) // cell + 1):
+                for cx in range((l - pad_w) // cell, (r - 1) // cell + 1):
+                    bucket = cells_b.get((cx, cy))
+                    if not bucket: continue
+                    for j in bucket:
+                        if same and j <= i: continue
+                        _, l2, t2, r2, b2 = bodies_b[j]
+                        if l < r2 and l2 < r and t < b2 and t2 < b:
+                            found.append(j)
+            if found:
+                found.sort()
+                out.extend((ref, bodies_b[j][0]) for j in found)
+        return out
+
+# --- CLASSES ---
+
+def anim_table(*anims):
+    """Tabela de animacoes de um tipo: (nome, prefixo, n) -> {"idle": ("knight_idle_1", ...)}."""
+    return {name: tuple(f"{prefix}_{i}" for i in range(1, count + 1)) for name, prefix, count in anims}
+
+class AnimatedSprite:
+    """Posicao (pes = bottom-center) e estado de animacao; quem desenha eh o frontend.
+
+    As entidades usam __slots__: so o estado de cada uma fica na instancia.
+    O que eh igual para todas do tipo (image_base, anim_speed e a tabela de
+    frames em `animations`) fica na classe.
+
+    STATE lista (campo, formato struct) do que vai para o snapshot; cada
+    subclasse estende a lista da base e ganha o seu `state_struct`.
+    """
+    __slots__ = ("x", "y", "current_anim", "frame_index", "timer", "image")
+    image_base = None
+    anim_speed = 0.15
+    animations = {}
+    STATE = (("x", "d"), ("y", "d"), ("frame_index", "H"), ("timer", "d"))
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Animacao atual e frame atual viram indices nas tabelas do tipo
+        cls.state_fields = tuple(name for name, _ in cls.STATE)
+        cls.state_struct = struct.Struct("<" + "".join(fmt for _, fmt in cls.STATE) + "BB")
+        cls.anim_names = tuple(cls.animations)
+        cls.frame_names = tuple(f for frames in cls.animations.values() for f in frames)
+        cls.anim_ids = {name: i for i, name in enumerate(cls.anim_names)}
+        cls.frame_ids = {name: i for i, name in enumerate(cls.frame_names)}
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.current_anim = "idle"
+        self.frame_index = 0
+        self.timer = 0
+        # Frame atual (nome da imagem), inicializa com idle padrao
+        self.image = f"{self.image_base}_idle_1"
+
+    def pack_state(self):
+        values = [getattr(self, name) for name in self.state_fields]
+        return self.state_struct.pack(*values, self.anim_ids[self.current_anim], self.frame_ids[self.image])
+
+    def unpack_state(self, data, off):
+        """Le o estado gravado por pack_state; devolve o offset seguinte."""
+        values = self.state_struct.unpack_from(data, off)
+        for name, value in zip(self.state_fields, values):
+            setattr(self, name, value)
+        self.current_anim = self.anim_names[values[-2]]
+        self.image = self.frame_names[values[-1]]
+        return off + self.state_struct.size
+
+    def update_anim(self, dt):
+        frames = self.animations.get(self.current_anim)
+        if not frames: return
+
+        self.timer += dt
+        if self.timer >= self.anim_speed:
+            self.timer = 0
+            self.frame_index = (self.frame_index + 1) % len(frames)
+            self.image = frames[self.frame_index]
+
+class Player(AnimatedSprite):
+    __slots__ = ("vx", "vy", "on_ground", "carrying", "lives", "start_pos", "invul_timer", "hit_log")
+    image_base = "knight"
+    animations = anim_table(
+        ("idle", "knight_idle", 3), ("run", "knight_run", 4), ("jump", "knight_jump", 2),
+        ("idle_carry", "knight_princess_idle", 3), ("run_carry", "knight_princess_run", 4),
+        ("jump_carry", "knight_princess_jump", 2))
+    STATE = AnimatedSprite.STATE + (("vx", "d"), ("vy", "d"), ("on_ground", "?"), ("carrying", "?"),
+                                    ("lives", "i"), ("invul_timer", "d"))
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.vx = 0
+        self.vy = 0
+        self.on_ground = False
+        self.carrying = False
+        self.lives = 3
+        self.start_pos = (x, y)
+        self.invul_timer = 0
+        self.hit_log = []  # Causa de cada vida perdida (imagem de quem acertou)
+
+    def update(self, dt, game):
+        tiles = game.tiles
+        controls = game.input
+        # Configurar velocidade e input
+        speed = PLAYER_SPEED_CARRYING if self.carrying else PLAYER_SPEED
+        dx = 0
+        if controls.left: dx = -speed
+        elif controls.right: dx = speed
+
+        # Gravidade preliminar
+        grav = GRAVITY_CARRYING if self.carrying else GRAVITY
+        self.vy += grav
+
+        # --- MOVIMENTO HORIZONTAL ---
+        self.x += dx
+
+        # Manter nos limites do mundo (Backup)
+        if self.x < 15: self.x = 15
+        if self.x > game.world_w - 15: self.x = game.world_w - 15
+
+        # Hitbox Horizontal
+        w, h = 30, 50
+        rect_x = pygame.Rect(self.x - w//2, self.y - h, w, h)
+
+        for p in tiles.solids_in(rect_x):
+            if rect_x.colliderect(p):
+                # Colisao Lateral
+                if dx > 0: # Indo pra direita
+                    self.x = p.left - w//2
+                    rect_x.left = self.x - w//2 # Atualiza rect para proxima checagem (opcional)
+                elif dx < 0: # Indo pra esquerda
+                    self.x = p.right + w//2
+                    rect_x.left = self.x - w//2
+
+        # --- MOVIMENTO VERTICAL ---
+        self.y += self.vy
+
+        # Hitbox Vertical (usando X ja corrigido)
+        rect_y = pygame.Rect(self.x - w//2, self.y - h, w, h)
+        self.on_ground = False
+
+        for p in tiles.solids_in(rect_y):
+            if rect_y.colliderect(p):
+                # Colisao Vertical
+                if self.vy > 0: # Caindo
+                    # Checagem extra: so aterriza se os pes (self.y) nao estiverem muito abaixo do topo
+                    # Isso evita ser " puxado" para o topo de uma parede lateral
+                    # A tolerancia ajuda a subir degrauzinhos pequenos mas barra paredes altas
+                    if (self.y - self.vy) <= p.top + 10:
+                        self.y = p.top
+                        self.vy = 0
+                        self.on_ground = True
+                elif self.vy < 0: # Batendo a cabeca
+                    self.y = p.bottom + h
+                    self.vy = 0
+
+        # Chão (Safety net)
+        if self.y > game.world_h:
+            self.y = game.world_h
+            self.vy = 0
+            self.on_ground = True
+
+        # 5. Pulo
+        if self.on_ground and controls.space:
+            self.vy = JUMP_STRENGTH
+            game.sfx("jump")
+
+        # 6. Escolha de Animação
+        suffix = "_carry" if self.carrying else ""
+        if not self.on_ground:
+            self.current_anim = "jump" + suffix
+        elif dx != 0:
+            self.current_anim = "run" + suffix
+        else:
+            self.current_anim = "idle" + suffix
+
+        self.update_anim(dt)
+
+        # Invulnerabilidade
+        if self.invul_timer > 0:
+            self.invul_timer -= dt
+
+    def hit(self, cause=None):
+        """Tira uma vida se nao estiver invulneravel; devolve se tirou."""
+        if self.invul_timer <= 0:
+            self.lives -= 1
+            self.invul_timer = 1.0 # 1s invul
+            self.hit_log.append(cause)
+            return True
+        return False
+
+class Princess(AnimatedSprite):
+    __slots__ = ("picked",)
+    image_base = "princess"
+    animations = anim_table(("idle", "princess_idle", 3))
+    STATE = AnimatedSprite.STATE + (("picked", "?"),)
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.picked = False
+
+    def update(self, dt):
+        self.update_anim(dt)
+
+# --- INIMIGOS ---
+
+class Enemy(AnimatedSprite, abc.ABC):
+    """Base dos inimigos. A IA roda em lote por tipo (update_batch), chamada pelo AIScheduler.
+
+    `span` eh o trecho (min_x, max_x) em que o centro do inimigo fica sobre o
+    chao dele, perto do spawn (ver walk_span); sem chao, so a propria celula. `uid` eh o
+    numero do inimigo no nivel (ordem do arquivo, sem a princesa).
+    """
+    __slots__ = ("ai_tick", "ai_wake", "min_x", "max_x", "uid")
+    STATE = AnimatedSprite.STATE + (("ai_tick", "i"), ("ai_wake", "i"), ("min_x", "i"), ("max_x", "i"))
+
+    def __init__(self, x, y, span=None, uid=0):
+        super().__init__(x, y)
+        self.ai_tick = 0  # Tick do ultimo update (o proximo recebe o dt acumulado)
+        self.ai_wake = 0  # Fora da tela e ocioso: dorme ate esse tick
+        self.min_x, self.max_x = span or (x - BLOCK_SIZE // 2, x + BLOCK_SIZE // 2)
+        self.uid = uid
+
+    def update(self, dt, game):
+        type(self).update_batch((self,), dt, game)
+
+    @staticmethod
+    @abc.abstractmethod
+    def update_batch(enemies, dt, game):
+        """Roda a IA de `enemies` (todos deste tipo) por `dt` segundos."""
+
+    def idle_time(self):
+        """Segundos em que o inimigo so espera um timer (pode dormir fora da tela)."""
+        return 0.0
+
+class FireEnemy(Enemy):
+    """Inimigo Fogo: Anda Dir(2s), Atira, Anda Esq(2s), Atira (sem sair do chao)."""
+    __slots__ = ("state", "timer_action")
+    image_base = "fire_monster"
+    animations = anim_table(("idle", "fire_monster_idle", 2), ("walk", "fire_monster_walk", 2))
+    STATE = Enemy.STATE + (("state", "B"), ("timer_action", "d"))
+
+    def __init__(self, x, y, span=None, uid=0):
+        super().__init__(x, y, span, uid)
+        self.state = 0 # 0=Dir, 1=Wait1, 2=Esq, 3=Wait2
+        self.timer_action = 0
+
+    @staticmethod
+    def update_batch(enemies, dt, game):
+        step = dt / FIXED_DT  # 1px por tick
+        spawn = game.projectiles.spawn
+        for e in enemies:
+            e.timer_action += dt
+            e.update_anim(dt)
+
+            if e.state == 0: # Dir 2s
+                e.x = min(e.x + step, e.max_x)
+                e.current_anim = "walk"
+                if e.timer_action > 2.0:
+                    e.state = 1
+                    e.timer_action = 0
+            elif e.state == 1: # Wait 1s -> Shoot
+                e.current_anim = "idle"
+                if e.timer_action > 1.0:
+                    game.sfx("fireball")
+                    # Cria projetil
+                    spawn(e.x, e.y, 5, PROJ_FIREBALL) # Dir
+                    e.state = 2
+                    e.timer_action = 0
+            elif e.state == 2: # Esq 2s
+                e.x = max(e.x - step, e.min_x)
+                e.current_anim = "walk"
+                if e.timer_action > 2.0:
+                    e.state = 3
+                    e.timer_action = 0
+            elif e.state == 3: # Wait 1s -> Shoot
+                e.current_anim = "idle"
+                if e.timer_action > 1.0:
+                    game.sfx("fireball")
+                    spawn(e.x, e.y, -5, PROJ_FIREBALL) # Esq
+                    e.state = 0
+                    e.timer_action = 0
+
+    def idle_time(self):
+        return 1.0 - self.timer_action if self.state in (1, 3) else 0.0
+
+class SwordEnemy(Enemy):
+    __slots__ = ("move_timer", "target_x", "const_y", "timer_action")
+    image_base = "sword_monster"
+    animations = anim_table(("idle", "sword_monster_idle", 2), ("walk", "sword_monster_walk", 2))
+    STATE = Enemy.STATE + (("move_timer", "d"), ("target_x", "d"), ("const_y", "d"), ("timer_action", "d"))
+    SPEED = 3.0             # px por tick andando ate o alvo
+    RETARGET_CHANCE = 0.04  # chance por tick de escolher outro alvo quando parado
+
+    def __init__(self, x, y, span=None, uid=0):
+        super().__init__(x, y, span, uid)
+        self.move_timer = 0
+        self.target_x = x
+        self.const_y = y
+        self.timer_action = 0
+
+    @staticmethod
+    def update_batch(enemies, dt, game):
+        rng = game.rng
+        ticks = dt / FIXED_DT
+        speed = SwordEnemy.SPEED * ticks
+        # Chance de trocar de alvo em `ticks` ticks seguidos
+        chance = 1 - (1 - SwordEnemy.RETARGET_CHANCE) ** ticks
+        spawn = game.projectiles.spawn
+        half = BLOCK_SIZE // 2
+        for e in enemies:
+            e.update_anim(dt)
+            e.timer_action += dt
+
+            # Comportamento: jogar espada para esquerda a cada 3s
+            if e.timer_action > 3.0:
+                e.timer_action = 0
+                game.sfx("sword_throw")
+                # Joga espada esquerda
+                spawn(e.x, e.y, -6, PROJ_SWORD) # Esquerda
+
+            # Movimento Aleatorio (manter simples)
+            if abs(e.x - e.target_x) < 5:
+                if rng.random() < chance:
+                    # Alvo aleatorio no proprio chao, com o corpo inteiro sobre ele
+                    e.target_x = rng.randint(e.min_x + half, e.max_x - half)
+            else:
+                e.current_anim = "walk"
+                # Nao passa do alvo quando o dt acumulado eh grande
+                e.x += max(-speed, min(speed, e.target_x - e.x))
+
+    def idle_time(self):
+        # Parado no alvo: so espera o proximo arremesso
+        return 3.0 - self.timer_action if abs(self.x - self.target_x) < 5 else 0.0
+
+def walk_span(tiles, x, y):
+    """(min_x, max_x) do chao continuo sob o ponto (x, y), ate PATROL_RADIUS do x; None se nao ha chao.
+
+    O raio mantem a patrulha perto do spawn: num chao comprido o inimigo nao
+    atravessa o nivel e nao sai da area ativa no meio do caminho.
+    """
+    span = tiles.floor_span(int(x) // BLOCK_SIZE, int(y) // BLOCK_SIZE)
+    if span is None:
+        return None
+    x = int(x)
+    return max(span[0] * BLOCK_SIZE, x - PATROL_RADIUS), min((span[1] + 1) * BLOCK_SIZE, x + PATROL_RADIUS)
+
+# Inimigos por codigo de entidade (nivel e snapshot)
+ENEMY_CLASSES = {ENT_FIRE: FireEnemy, ENT_SWORD: SwordEnemy}
+ENEMY_CODES = {cls: code for code, cls in ENEMY_CLASSES.items()}
+
+# --- POOL DE ENTIDADES ---
+class EntityPool:
+    """Free-list por classe: entidades descartadas no reset sao reaproveitadas.
+
+    `get` reinicializa um objeto livre (mesmo __init__) em vez de alocar outro,
+    entao reiniciar ou trocar de nivel nao gera lixo para o GC. Os projeteis
+    ja ficam no ProjectilePool, que reaproveita os proprios arrays.
+    """
+    def __init__(self):
+        self.free = {}  # classe -> [objetos livres]
+
+    def get(self, cls, *args):
+        free = self.free.get(cls)
+        if free:
+            obj = free.pop()
+            obj.__init__(*args)
+            return obj
+        return cls(*args)
+
+    def release(self, obj):
+        self.free.setdefault(type(obj), []).append(obj)
+
+    def release_all(self, objs):
+        for obj in objs:
+            self.release(obj)
+
+    def size(self):
+        return sum(len(free) for free in self.free.values())
+
+# --- STREAMING DE CHUNKS ---
+_stream_executor = None
+
+def stream_executor():
+    """Thread (unica, compartilhada) que prepara chunks antes de a camera chegar."""
+    global _stream_executor
+    if _stream_executor is None:
+        _stream_executor = ThreadPoolExecutor(1, thread_name_prefix="stream")
+    return _stream_executor
+
+class WorldStream:
+    """Inimigos de um nivel grande carregados por chunk em volta da camera.
+
+    Os chunks (level.chunk_tiles tiles de lado) que tocam a tela com
+    STREAM_LOAD_MARGIN de folga sao ativados: inimigos que nunca nasceram
+    saem do indice do nivel e os suspensos voltam do estado guardado. Os que
+    passam de STREAM_KEEP_MARGIN sao descarregados: cada inimigo vira os
+    bytes do pack_state e o objeto volta para o EntityPool. Projeteis nunca
+    ficam para tras, porque somem ao sair da area ativa.
+
+    A thread de stream_executor le os registros e calcula o walk_span dos
+    chunks logo alem da borda; o que nao ficou pronto eh feito na hora,
+    entao a simulacao nao depende do tempo da thread.
+    """
+    def __init__(self, game):
+        self.game = game
+        self.level = game.level
+        self.size = self.level.chunk_tiles * BLOCK_SIZE
+        self.live = {}        # uid -> inimigo carregado
+        self.suspended = {}   # (cx, cy) -> {uid: (classe, bytes do pack_state)}
+        self.touched = bytearray(self.level.n_enemies)  # 1 = ja nasceu (vivo ou suspenso)
+        self.resident = set() # Chunks ativos
+        self.span = None      # Chunks da area de carga na ultima atualizacao
+        self.pending = {}     # Chunk -> Future(prepare) da thread
+        self.loads = 0        # Chunks ativados
+        self.unloads = 0      # Inimigos suspensos
+        self.stalls = 0       # Chunks que a thread nao preparou a tempo
+
+    def chunk_of(self, x, y):
+        return int(x // self.size), int(y // self.size)
+
+    def chunk_span(self, rect):
+        size = self.size
+        return (max(rect.left // size, 0), min((rect.right - 1) // size, self.level.chunk_cols - 1),
+                max(rect.top // size, 0), min((rect.bottom - 1) // size, self.level.chunk_rows - 1))
+
+    @staticmethod
+    def chunks(span):
+        c0, c1, r0, r1 = span
+        return {(cx, cy) for cy in range(r0, r1 + 1) for cx in range(c0, c1 + 1)}
+
+    def prepare(self, key):
+        """(versao dos tiles, [(uid, classe, x, y, span)]) dos inimigos que nascem no chunk."""
+        tiles = self.game.tiles
+        version = tiles.version
+        return version, [(uid, ENEMY_CLASSES[kind], x, y, walk_span(tiles, x, y))
+                         for uid, kind, x, y in self.level.enemies_in_chunk(*key)]
+
+    def load(self, records):
+        """Recomeca com os inimigos `records` [(uid, classe, bytes)] suspensos e nenhum chunk ativo.
+
+        Os objetos vivos devem ter sido devolvidos ao pool por quem chamou.
+        """
+        self.live = {}
+        self.suspended = {}
+        self.touched = bytearray(self.level.n_enemies)
+        self.resident = set()
+        self.span = None
+        for uid, cls, data in records:
+            x, y = struct.unpack_from("<dd", data, 0)  # STATE comeca por x, y
+            self.suspended.setdefault(self.chunk_of(x, y), {})[uid] = (cls, data)
+            self.touched[uid] = 1
+
+    def records(self):
+        """[(uid, classe, bytes)] de todos os inimigos ja nascidos, em ordem de uid."""
+        out = [(uid, type(e), e.pack_state()) for uid, e in self.live.items()]
+        for chunk in self.suspended.values():
+            out += [(uid, cls, data) for uid, (cls, data) in chunk.items()]
+        out.sort(key=lambda r: r[0])
+        return out
+
+    def update(self, camera):
+        """Ativa e descarrega chunks para a posicao da camera; True se algo mudou."""
+        span = self.chunk_span(camera.rect(STREAM_LOAD_MARGIN))
+        if span == self.span:
+            return False
+        self.span = span
+        game = self.game
+        pool, index, live = game.pool, game.enemy_index, self.live
+        keep = self.chunks(self.chunk_span(camera.rect(STREAM_KEEP_MARGIN)))
+        load = self.chunks(span)
+        resident = (self.resident & keep) | load
+
+        # Suspende quem ficou fora dos chunks ativos
+        for uid in [uid for uid, e in live.items() if self.chunk_of(e.x, e.y) not in resident]:
+            e = live.pop(uid)
+            self.suspended.setdefault(self.chunk_of(e.x, e.y), {})[uid] = (type(e), e.pack_state())
+            index.remove(uid)
+            pool.release(e)
+            self.unloads += 1
+
+        # Ativa os chunks novos: suspensos voltam, os nunca vistos nascem
+        version = game.tiles.version
+        for key in sorted(load - self.resident):
+            for uid, (cls, data) in self.suspended.pop(key, {}).items():
+                e = pool.get(cls, 0, 0)
+                e.unpack_state(data, 0)
+                e.uid = uid
+                live[uid] = e
+                index.place(uid, e.x, e.y)
+            future = self.pending.pop(key, None)
+            if future is not None and future.done() and future.result()[0] == version:
+                prepared = future.result()[1]
+            else:
+                if future is not None: future.cancel()
+                self.stalls += 1
+                prepared = self.prepare(key)[1]
+            for uid, cls, x, y, walk in prepared:
+                if self.touched[uid]: continue
+                self.touched[uid] = 1
+                e = live[uid] = pool.get(cls, x, y, walk, uid)
+                index.place(uid, x, y)
+            self.loads += 1
+        self.resident = resident
+        game.enemies = [live[uid] for uid in sorted(live)]
+
+        # Prepara na thread os chunks logo alem da area de carga
+        ahead = self.chunks(self.chunk_span(camera.rect(STREAM_PREFETCH_MARGIN))) - resident
+        for key in [key for key in self.pending if key not in ahead]:
+            self.pending.pop(key).cancel()
+        executor = stream_executor()
+        for key in sorted(ahead):
+            if key not in self.pending:
+                self.pending[key] = executor.submit(self.prepare, key)
+        return True
+
+    def stats(self):
+        return {"live": len(self.live), "suspended": sum(len(c) for c in self.suspended.values()),
+                "resident": len(self.resident), "loads": self.loads, "unloads": self.unloads,
+                "stalls": self.stalls}
+
+# --- SNAPSHOT ---
+# Formato binario do Game.snapshot (little-endian, versao em SNAPSHOT_VERSION):
+#   cabecalho | estado do RNG | player | princesa | inimigos | projeteis
+SNAPSHOT_MAGIC = b"STPS"
+SNAPSHOT_VERSION = 1
+# magic, versao, flags, estado, tick, acumulador, tick da coleta (-1), colunas, linhas, inimigos
+SNAPSHOT_HEADER = struct.Struct("<4sHBBIdiHHI")
+SNAP_WORLD = 1     # Ha partida montada (fora do menu inicial)
+SNAP_PRINCESS = 2  # O nivel tem princesa
+SNAP_STREAM = 4    # Nivel por chunks: so os inimigos ja nascidos, cada um com o uid
+SNAPSHOT_RNG = struct.Struct("<625I?d")  # random.Random.getstate(): estado do MT e gauss_next
+STATES = (STATE_MENU, STATE_PLAYING, STATE_GAME_OVER, STATE_VICTORY)
+# Causas possiveis no hit_log do player (gravadas como indice)
+HIT_CAUSES = (None,) + PROJECTILE_IMAGES + tuple(cls.image_base for cls in ENEMY_CLASSES.values())
+
+# --- AGENDADOR DE IA ---
+AI_VISIBLE_MARGIN = BLOCK_SIZE  # Inimigos na tela (com essa folga): todo tick
+AI_NEAR_INTERVAL = 4            # Perto mas fora da tela: 1 update a cada N ticks
+AI_MAX_CATCHUP = 60             # Maximo de ticks acumulados num unico update
+# Sono maximo de um ocioso: acordando no proximo tick do intervalo, o dt acumulado
+# ainda cabe em AI_MAX_CATCHUP e o inimigo nao perde tempo de IA fora da tela
+AI_MAX_SLEEP = AI_MAX_CATCHUP - AI_NEAR_INTERVAL
+
+class AIScheduler:
+    """Decide quais inimigos rodam a IA em cada tick e atualiza em lote por tipo.
+
+    - na tela: todo tick, com dt fixo;
+    - ativos fora da tela (ate UPDATE_MARGIN): a cada AI_NEAR_INTERVAL ticks,
+      com o dt acumulado; se estao ociosos (idle_time) dormem ate o timer vencer
+      (no maximo AI_MAX_SLEEP ticks);
+    - longe: dormindo, fora da consulta de ativos do Game; acordam ao chegar perto.
+
+    Os lotes seguem a ordem em que cada tipo aparece na lista de inimigos.
+    """
+    def __init__(self):
+        self.groups = None  # Nivel sem rolagem: [(classe, inimigos)] fixos
+        self.updated = 0    # Inimigos atualizados no ultimo tick
+
+    def reset(self, game):
+        self.groups = None
+        if not game.scrolling:
+            self.groups = list(self.batch(game.enemies).items())
+
+    @staticmethod
+    def batch(enemies):
+        groups = {}
+        for e in enemies:
+            groups.setdefault(type(e), []).append(e)
+        return groups
+
+    def update(self, game):
+        dt = FIXED_DT
+        if self.groups is not None:
+            # Tudo cabe na tela: todos todo tick
+            for cls, group in self.groups:
+                cls.update_batch(group, dt, game)
+            self.updated = len(game.enemies)
+            return
+        tick = game.ticks
+        visible = game.camera.rect(AI_VISIBLE_MARGIN)
+        x0, y0, x1, y1 = visible.left, visible.top, visible.right, visible.bottom
+        batches = {}
+        updated = []
+        offscreen = []
+        for i, e in zip(game.active_ids, game.active_enemies):
+            if not (x0 <= e.x < x1 and y0 <= e.y < y1):
+                if (tick + i) % AI_NEAR_INTERVAL or tick < e.ai_wake:
+                    continue
+                offscreen.append(e)
+            steps = min(tick - e.ai_tick, AI_MAX_CATCHUP)
+            e.ai_tick = tick
+            key = (type(e), steps)
+            group = batches.get(key)
+            if group is None: batches[key] = [e]
+            else: group.append(e)
+            updated.append((i, e))
+        for (cls, steps), group in batches.items():
+            cls.update_batch(group, dt * steps, game)
+        for e in offscreen:
+            e.ai_wake = tick + min(int(e.idle_time() / dt), AI_MAX_SLEEP)
+        # So quem rodou pode ter mudado de bloco no indice
+        index = game.enemy_index
+        size, where = index.size, index.where
+        for i, e in updated:
+            if where[i] != (int(e.x // size), int(e.y // size)):
+                index.place(i, e.x, e.y)
+        self.updated = len(updated)
+
+class Game:
+    """Estado do jogo e regras. Avanca em ticks fixos de FIXED_DT.
+
+    `input` eh qualquer objeto com .left/.right/.space (InputState ou o
+    keyboard do pgzero); `audio` recebe os pedidos de som (NullAudio se omitido);
+    `level` eh um level.Level ou o caminho de um arquivo de nivel; `stream`
+    forca (True) ou desliga (False) a carga por chunks, que por padrao so
+    vale para niveis com rolagem e mais de STREAM_MIN_CELLS tiles.
+    """
+    def __init__(self, input=None, audio=None, seed=None, level=None, stream=None):
+        self.state = STATE_MENU
+        self.music_on = True
+        self.input = input if input is not None else InputState()
+        self.audio = audio if audio is not None else NullAudio()
+        self.rng = random.Random(seed)
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.quit_requested = False
+        self.recorder = None  # replay.Recorder, quando gravando a sessao
+        self.level = level if level is not None else DEFAULT_LEVEL
+        self.streaming = stream
+
+        # Botoes UI (Definidos no init para nao recriar sempre)
+        cx, cy = WIDTH//2, HEIGHT//2
+        self.btn_start = pygame.Rect(cx-100, cy-50, 200, 50)
+        self.btn_sound = pygame.Rect(cx-100, cy+20, 200, 50)
+        self.btn_exit = pygame.Rect(cx-100, cy+90, 200, 50)
+        self.btn_home = pygame.Rect(WIDTH-50, 10, 40, 40)
+        self.btn_sound_small = pygame.Rect(WIDTH-100, 10, 40, 40)
+        self.btn_back = pygame.Rect(cx-100, cy+100, 200, 50)
+        self.btn_retry = pygame.Rect(cx-100, cy+170, 200, 50)
+
+        # Inicializa o jogo vazio ou com padroes, mas o reset real eh no start
+        self.tiles = None
+        self.tiles_level = None
+        self.enemies = []
+        self.player = self.princess = None
+        self.pool = EntityPool()  # Entidades do reset anterior, para reaproveitar
+        self.start_state = None   # ((nivel, versao dos tiles), snapshot logo apos o reset)
+        self.checkpoint = None    # Snapshot do tick em que a princesa foi pega
+        self.pickup_tick = None
+        self.projectiles = ProjectilePool()
+        # Mundo e camera: inimigos fora da tela (mais UPDATE_MARGIN) ficam parados
+        self.world_w, self.world_h = WIDTH, HEIGHT
+        self.camera = Camera()
+        self.view = self.camera.rect(UPDATE_MARGIN)  # Area ativa (mundo)
+        self.scrolling = False  # Mundo maior que a tela (ver reset_game)
+        self.stream = None      # WorldStream, quando o nivel carrega por chunks
+        self.enemy_index = ChunkIndex()
+        self.active_ids = []
+        self.active_enemies = []
+        self.ai = AIScheduler()
+
+    def sfx(self, name):
+        if self.music_on:
+            self.audio.play_sfx(name)
+
+    def load_world(self):
+        """Carrega o nivel (uma vez) e ajusta o mundo e o Spawn; nao mexe nas entidades."""
+        if isinstance(self.level, str):
+            from level import load_level  # Import tardio: level.py depende do engine
+            self.level = load_level(self.level)
+        level = self.level
+        # Indice de colisao (montado uma vez por nivel, reaproveitado nos restarts)
+        if self.tiles is None or self.tiles_level is not level:
+            self.tiles = TileGrid(level.cols, level.rows, level.tiles)
+            self.tiles_level = level
+        self.world_w = max(level.cols * BLOCK_SIZE, WIDTH)
+        self.world_h = max(level.rows * BLOCK_SIZE, HEIGHT)
+
+        # Definir Spawn Final
+        if level.spawn_pos is not None:
+            self.spawn_pos = level.spawn_pos
+            self.spawn_rect = pygame.Rect(level.spawn_rect)
+        else:
+             # Fallback
+             self.spawn_pos = (100, 520)
+             self.spawn_rect = pygame.Rect(80, 520, 80, 40)
+        self.scrolling = self.world_w > WIDTH or self.world_h > HEIGHT
+        streamed = self.streaming
+        if streamed is None:
+            streamed = level.cols * level.rows >= STREAM_MIN_CELLS
+        if not (streamed and self.scrolling):
+            self.stream = None
+        elif self.stream is None or self.stream.level is not level:
+            self.stream = WorldStream(self)
+
+    def reset_game(self):
+        # Reinicia variaveis do jogo, mantendo configuracoes (music_on)
+        self.load_world()
+        self.checkpoint = None
+        key = (self.level, self.tiles.version)
+        if self.start_state is not None and self.start_state[0] == key:
+            # Restart: volta ao estado inicial guardado, reaproveitando as entidades
+            state = self.state
+            self.restore(self.start_state[1], rng=False)
+            self.state = state
+        else:
+            self.spawn_entities()
+            self.start_state = (key, self.snapshot())
+
+        # Reset musica se necessario
+        if self.music_on:
+             self.audio.play_bgm()
+
+    def spawn_entities(self):
+        """Cria as entidades do nivel do zero (primeira partida ou nivel editado)."""
+        pool = self.pool
+        pool.release_all(self.enemies)
+        for e in (self.player, self.princess):
+            if e is not None: pool.release(e)
+        self.enemies = []
+        self.princess = None
+        self.projectiles.clear()
+        self.ticks = 0
+        self.pickup_tick = None
+        self.accumulator = 0.0
+
+        if self.stream is not None:
+            # Os inimigos nascem por chunk, quando a camera chega perto (index_entities)
+            self.stream.load(())
+            if self.level.princess is not None:
+                self.princess = pool.get(Princess, *self.level.princess)
+        else:
+            # Entidades ja vem compiladas (tipo, x, y dos pes)
+            for kind, x, y in self.level.entities:
+                if kind == ENT_PRINCESS:
+                    self.princess = pool.get(Princess, x, y)
+                elif kind in ENEMY_CLASSES:
+                    uid = len(self.enemies)
+                    self.enemies.append(pool.get(ENEMY_CLASSES[kind], x, y, walk_span(self.tiles, x, y), uid))
+        self.player = pool.get(Player, *self.spawn_pos)
+        self.index_entities()
+
+    def index_entities(self):
+        """Refaz camera, indice de inimigos e agendador a partir das posicoes atuais."""
+        # Nivel do tamanho da tela: camera parada e todos os inimigos sempre ativos
+        self.enemy_index = ChunkIndex()
+        if self.scrolling:
+            # Com streaming a lista ainda esta vazia: update_view ativa os chunks
+            for e in self.enemies:
+                self.enemy_index.place(e.uid, e.x, e.y)
+        else:
+            self.camera.x = self.camera.y = 0
+            self.view = self.camera.rect(UPDATE_MARGIN)
+            self.active_ids = list(range(len(self.enemies)))
+            self.active_enemies = self.enemies
+        self.update_view()
+        self.ai.reset(self)
+
+    def start(self):
+        """Comeca uma partida nova (mesmo efeito do botao JOGAR)."""
+        self.reset_game()
+        self.state = STATE_PLAYING
+
+    def retry(self):
+        """Volta ao checkpoint (princesa pega), ou recomeca o nivel se nao houver."""
+        if self.checkpoint is None:
+            self.start()
+            return
+        self.restore(self.checkpoint)
+        self.state = STATE_PLAYING
+        if self.music_on:
+            self.audio.play_bgm()
+
+    def update_view(self):
+        """Move a camera para o player e recalcula os inimigos ativos (perto da tela)."""
+        if not self.scrolling: return
+        self.camera.follow(self.player.x, self.player.y, self.world_w, self.world_h)
+        self.view = self.camera.rect(UPDATE_MARGIN)
+        stream = self.stream
+        if stream is not None:
+            stream.update(self.camera)
+        ids = self.enemy_index.query(self.view)
+        if ids is not self.active_ids:
+            enemies = self.enemies if stream is None else stream.live
+            self.active_ids = ids
+            self.active_enemies = [enemies[i] for i in ids]
+
+    def update(self, dt):
+        """Avanca o relogio real `dt` em ticks fixos; o resto fica acumulado."""
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= FIXED_DT and steps < MAX_STEPS_PER_UPDATE:
+            self.accumulator -= FIXED_DT
+            self.step()
+            steps += 1
+        if steps == MAX_STEPS_PER_UPDATE:
+            self.accumulator = 0.0
+
+    def step(self, input=None):
+        """Um tick fixo da simulacao. `input` substitui a entrada atual, se passado."""
+        if input is not None:
+            self.input = input
+        if self.recorder is not None:
+            self.recorder.on_step(self.input)
+        if self.state != STATE_PLAYING:
+            return
+        dt = FIXED_DT
+        self.ticks += 1
+        self.player.update(dt, self)
+        if self.princess is not None:  # Nivel sem K: nada para pegar
+            self.princess.update(dt)
+        self.update_view()
+        self.ai.update(self)
+        if self.scrolling:
+            # Projeteis somem ao sair do mundo ou da area ativa em volta da tela
+            view = self.view
+            self.projectiles.update(max(view.left, 0), min(view.right, self.world_w), view.top, view.bottom)
+        else:
+            self.projectiles.update(0, self.world_w)
+
+        # Princesa, dano de inimigos e projeteis
+        self.collide()
+
+        # Vitoria
+        if self.player.carrying:
+            rect = pygame.Rect(self.player.x, self.player.y, 10, 10)
+            if rect.colliderect(self.spawn_rect):
+                self.state = STATE_VICTORY
+                self.sfx("collect")
+
+        if self.player.lives <= 0:
+            self.state = STATE_GAME_OVER
+
+        # Checkpoint so com o tick completo e o player vivo (senao o retry volta para a morte)
+        if self.pickup_tick == self.ticks and self.state == STATE_PLAYING:
+            self.checkpoint = self.snapshot()
+
+    def collide(self):
+        """Testa o player contra princesa, inimigos ativos e projeteis, chamando o callback de cada toque.
+
+        Eh um corpo so contra poucos: a varredura direta sai mais barata que
+        montar um CollisionGrid, que fica para pares muitos-contra-muitos. Os
+        projeteis sao testados em lote no ProjectilePool (hits).
+        """
+        p = self.player
+        l, t = int(p.x - 15), int(p.y - 25)
+        r, b = l + 30, t + 50
+        k = self.princess
+        if k is not None and not p.carrying:
+            # Caixa que contem o raio de coleta; o callback mede a distancia
+            kl, kt = int(k.x - 50), int(k.y - 50)
+            if l < kl + 100 and kl < r and t < kt + 100 and kt < b:
+                self.on_touch_princess(p, k)
+        for e in self.active_enemies:
+            el, et = int(e.x - 20), int(e.y - 20)
+            if l < el + 40 and el < r and t < et + 40 and et < b:
+                self.on_touch_enemy(p, e)
+        if self.projectiles.count:
+            # hits ja descarta os que tocaram o player
+            for kind in self.projectiles.hits(pygame.Rect(l, t, 30, 50)):
+                self.on_touch_projectile(p, kind)
+
+    def on_touch_princess(self, player, princess):
+        # Distancia simples
+        d = ((player.x - princess.x)**2 + (player.y - princess.y)**2)**0.5
+        if d < 50 and not player.carrying:
+            player.carrying = True
+            princess.picked = True
+            self.pickup_tick = self.ticks
+            self.sfx("collect")
+
+    def on_touch_enemy(self, player, enemy):
+        # Corpo
+        player.hit(enemy.image_base)
+
+    def on_touch_projectile(self, player, kind):
+        # O projetil ja sumiu (mesmo se o player estiver invulneravel)
+        player.hit(PROJECTILE_IMAGES[kind])
+
+    def run(self, ticks, input=None):
+        """Roda `ticks` passos seguidos (headless) e devolve o estado final."""
+        for _ in range(ticks):
+            self.step(input)
+            if self.state != STATE_PLAYING:
+                break
+        return self.state
+
+    def snapshot(self):
+        """Estado da simulacao em bytes compactos (ver SNAPSHOT_HEADER).
+
+        Entra so o que muda durante a partida: fisica e vidas do player,
+        princesa, maquinas de estado e timers dos inimigos, projeteis e RNG.
+        Nivel, tiles, entrada, audio e configuracoes (music_on) ficam de fora.
+        Com streaming vao so os inimigos ja nascidos (vivos ou suspensos).
+        """
+        player = self.player
+        world = player is not None
+        stream = self.stream if world else None
+        flags = (SNAP_WORLD if world else 0) | (SNAP_PRINCESS if self.princess is not None else 0)
+        if stream is not None:
+            flags |= SNAP_STREAM
+            records = stream.records()  # [(uid, classe, bytes)]
+            n_enemies = len(records)
+        else:
+            n_enemies = len(self.enemies) if world else 0
+        level = self.level if world else None
+        pickup = -1 if self.pickup_tick is None else self.pickup_tick
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags, STATES.index(self.state),
+                                      self.ticks, self.accumulator, pickup,
+                                      level.cols if world else 0, level.rows if world else 0,
+                                      n_enemies)]
+        _, mt, gauss = self.rng.getstate()
+        parts.append(SNAPSHOT_RNG.pack(*mt, gauss is not None, gauss or 0.0))
+        if world:
+            parts.append(player.pack_state())
+            parts.append(struct.pack("<H", len(player.hit_log)))
+            parts.append(bytes(HIT_CAUSES.index(cause) for cause in player.hit_log))
+            if self.princess is not None:
+                parts.append(self.princess.pack_state())
+            if stream is not None:
+                parts.append(struct.pack(f"<{len(records)}I", *(uid for uid, _, _ in records)))
+                parts.append(bytes(ENEMY_CODES[cls] for _, cls, _ in records))
+                parts += [data for _, _, data in records]
+            else:
+                parts.append(bytes(ENEMY_CODES[type(e)] for e in self.enemies))
+                parts += [e.pack_state() for e in self.enemies]
+            parts.append(self.projectiles.to_bytes())
+        return b"".join(parts)
+
+    def restore(self, snapshot, rng=True):
+        """Volta ao estado de `snapshot` no mesmo nivel, reaproveitando as entidades.
+
+        O snapshot continua reutilizavel. Com rng=False o RNG segue de onde esta.
+        """
+        (magic, version, flags, state, ticks, accumulator, pickup,
+         cols, rows, n_enemies) = SNAPSHOT_HEADER.unpack_from(snapshot, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("snapshot invalido")
+        off = SNAPSHOT_HEADER.size
+        if rng:
+            values = SNAPSHOT_RNG.unpack_from(snapshot, off)
+            self.rng.setstate((3, values[:625], values[626] if values[625] else None))
+        off += SNAPSHOT_RNG.size
+        self.state = STATES[state]
+        self.ticks = ticks
+        self.accumulator = accumulator
+        self.pickup_tick = None if pickup < 0 else pickup
+        if self.pickup_tick is None:
+            self.checkpoint = None  # Checkpoint de um futuro que nao aconteceu
+        pool = self.pool
+        if not flags & SNAP_WORLD:
+            pool.release_all(self.enemies)
+            for e in (self.player, self.princess):
+                if e is not None: pool.release(e)
+            self.player = self.princess = None
+            self.enemies = []
+            self.active_ids, self.active_enemies = [], []
+            self.projectiles.clear()
+            return
+        self.load_world()
+        if (cols, rows) != (self.level.cols, self.level.rows):
+            raise ValueError("snapshot de outro nivel")
+        if bool(flags & SNAP_STREAM) != (self.stream is not None):
+            raise ValueError("snapshot de outro modo de carga (streaming)")
+
+        if self.player is None:
+            self.player = pool.get(Player, *self.spawn_pos)
+        player = self.player
+        off = player.unpack_state(snapshot, off)
+        n, = struct.unpack_from("<H", snapshot, off)
+        off += 2
+        player.hit_log = [HIT_CAUSES[i] for i in snapshot[off:off + n]]
+        off += n
+        if flags & SNAP_PRINCESS:
+            if self.princess is None:
+                self.princess = pool.get(Princess, 0, 0)
+            off = self.princess.unpack_state(snapshot, off)
+        elif self.princess is not None:
+            pool.release(self.princess)
+            self.princess = None
+
+        if self.stream is not None:
+            # Todos voltam suspensos; os perto da camera sao ativados no index_entities
+            uids = struct.unpack_from(f"<{n_enemies}I", snapshot, off)
+            off += 4 * n_enemies
+            codes = snapshot[off:off + n_enemies]
+            off += n_enemies
+            records = []
+            for uid, code in zip(uids, codes):
+                cls = ENEMY_CLASSES[code]
+                size = cls.state_struct.size
+                records.append((uid, cls, snapshot[off:off + size]))
+                off += size
+            pool.release_all(self.enemies)
+            self.enemies = []
+            self.stream.load(records)
+        else:
+            # Inimigos do mesmo tipo na mesma posicao da lista sao reaproveitados
+            codes = snapshot[off:off + n_enemies]
+            off += n_enemies
+            old = self.enemies
+            enemies = []
+            for i, code in enumerate(codes):
+                cls = ENEMY_CLASSES[code]
+                if i < len(old) and type(old[i]) is cls:
+                    e = old[i]
+                else:
+                    if i < len(old): pool.release(old[i])
+                    e = pool.get(cls, 0, 0)
+                off = e.unpack_state(snapshot, off)
+                e.uid = i
+                enemies.append(e)
+            pool.release_all(old[len(codes):])
+            self.enemies = enemies
+        self.projectiles.load_bytes(snapshot, off)
+        self.index_entities()
+
+    def save(self, path):
+        """Grava o snapshot comprimido (save game)."""
+        with open(path, "wb") as f:
+            f.write(zlib.compress(self.snapshot(), 9))
+
+    def load(self, path):
+        """Carrega um save de `save` (o Game precisa estar no mesmo nivel)."""
+        with open(path, "rb") as f:
+            self.restore(zlib.decompress(f.read()))
+
+    def on_mouse_down(self, pos):
+        if self.recorder is not None:
+            self.recorder.on_click(pos)
+        if self.state == STATE_MENU:
+            if self.btn_start.collidepoint(pos):
+                self.start() # Usa reset, nao init, pra manter settings
+                # Musica ja tratada no reset_game
+            elif self.btn_sound.collidepoint(pos):
+                self.music_on = not self.music_on
+                if self.music_on: self.audio.play_bgm()
+                else: self.audio.stop_bgm()
+            elif self.btn_exit.collidepoint(pos):
+                self.quit_requested = True
+
+        elif self.state == STATE_PLAYING:
+            if self.btn_home.collidepoint(pos):
+                self.state = STATE_MENU
+                self.audio.stop_bgm()
+            elif self.btn_sound_small.collidepoint(pos):
+                self.music_on = not self.music_on
+                if self.music_on: self.audio.play_bgm()
+                else: self.audio.stop_bgm()
+
+        elif self.state in (STATE_GAME_OVER, STATE_VICTORY):
+            if self.btn_back.collidepoint(pos):
+                self.state = STATE_MENU
+                self.audio.stop_bgm()
+            elif self.state == STATE_GAME_OVER and self.btn_retry.collidepoint(pos):
+                self.retry()
@@ -0,0 +1,292 @@
+"""Niveis em arquivo texto com cache binario compilado.
+
+Formato do arquivo (levels/*.txt):
+
+    # comentario
+    name = Castelo
+    spawn_min_row = 11
+    ---
+    WWWWWWWWWW
+    W  K     W
+    ...
+
+Acima do `---` ficam os metadados (`chave = valor`); abaixo, o grid ASCII
+W/P/C/K/F/S. Na primeira carga o nivel eh compilado para um `.lvlc` ao lado
+do fonte (tiles, lista de entidades, area de spawn e um indice dos inimigos
+por chunk de CHUNK_TILES x CHUNK_TILES tiles) e as cargas seguintes so
+mapeiam esse arquivo com mmap; nada eh lido antes de ser usado, entao abrir
+um nivel enorme custa o mesmo que um pequeno. O cache eh refeito quando o
+mtime (ou o tamanho) do fonte muda.
+
+    python level.py levels/       # compila todos os niveis da pasta
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from engine import BLOCK_SIZE, TILE_CODES, ENTITY_CODES, ENT_PRINCESS
+
+COMPILED_EXT = ".lvlc"
+MAGIC = b"STPL"
+VERSION = 2
+# magic, versao, mtime_ns e tamanho do fonte, colunas, linhas, entidades,
+# tem_spawn, spawn (x, y) e retangulo de spawn (x, y, w, h), tem_princesa,
+# princesa (x, y), lado do chunk em tiles, bytes do nome
+HEADER = struct.Struct("<4sHqqIIIB6iB2iHH")
+ENTITY = struct.Struct("<Bii")  # tipo, x, y (pes)
+CHUNK_TILES = 16  # Lado (em tiles) dos chunks do indice de inimigos (streaming no engine)
+
+
+class LevelError(Exception):
+    """Arquivo de nivel invalido."""
+
+
+def _uint32s(buf):
+    """uint32 little-endian de `buf` (sem copia numa maquina little-endian)."""
+    view = memoryview(buf).cast("I")
+    if sys.byteorder == "little":
+        return view
+    values = array("I", view)
+    values.byteswap()
+    return values
+
+def _pack_uint32s(values):
+    values = array("I", values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+class EntityTable:
+    """Registros (tipo, x, y) lidos do arquivo mapeado so quando pedidos."""
+    def __init__(self, buf, count):
+        self.buf = buf
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return ENTITY.unpack_from(self.buf, i * ENTITY.size)
+
+    def __iter__(self):
+        return ENTITY.iter_unpack(self.buf)
+
+
+def chunk_index(cols, rows, entities, chunk_tiles=CHUNK_TILES):
+    """(princesa, inicios, pares) do indice de inimigos por chunk.
+
+    Os inimigos sao numerados (uid) na ordem do nivel, sem a princesa;
+    `pares` tem (indice da entidade, uid) agrupados por chunk, linha a linha,
+    e os do chunk k ficam entre inicios[k] e inicios[k + 1].
+    """
+    size = chunk_tiles * BLOCK_SIZE
+    chunk_cols = -(-cols // chunk_tiles)
+    chunk_rows = -(-rows // chunk_tiles)
+    buckets = [[] for _ in range(chunk_cols * chunk_rows)]
+    princess = None
+    uid = 0
+    for i, (kind, x, y) in enumerate(entities):
+        if kind == ENT_PRINCESS:
+            princess = (x, y)  # A ultima encontrada vale
+            continue
+        cx = min(x // size, chunk_cols - 1)
+        cy = min(y // size, chunk_rows - 1)
+        buckets[cy * chunk_cols + cx] += (i, uid)
+        uid += 1
+    starts = [0]
+    pairs = []
+    for bucket in buckets:
+        pairs += bucket
+        starts.append(len(pairs) // 2)
+    return princess, array("I", starts), array("I", pairs)
+
+
+class Level:
+    """Nivel compilado: grid de tiles (1 byte por celula), entidades e spawn.
+
+    `tiles` pode ser um memoryview sobre o arquivo mapeado; trate como
+    somente leitura. `index` eh o resultado de chunk_index (calculado aqui
+    se omitido).
+    """
+    def __init__(self, name, cols, rows, tiles, entities, spawn_pos=None, spawn_rect=None, path=None,
+                 index=None, chunk_tiles=CHUNK_TILES):
+        self.name = name
+        self.cols = cols
+        self.rows = rows
+        self.tiles = tiles
+        self.entities = entities      # [(tipo, x, y), ...] ou EntityTable
+        self.spawn_pos = spawn_pos    # (x, y) ou None
+        self.spawn_rect = spawn_rect  # (x, y, w, h) ou None
+        self.path = path
+        self.chunk_tiles = chunk_tiles
+        self.chunk_cols = -(-cols // chunk_tiles)
+        self.chunk_rows = -(-rows // chunk_tiles)
+        if index is None:
+            index = chunk_index(cols, rows, entities, chunk_tiles)
+        self.princess, self.chunk_starts, self.chunk_pairs = index  # princesa: (x, y) ou None
+        self.n_enemies = len(self.chunk_pairs) // 2
+
+    def enemies_in_chunk(self, cx, cy):
+        """[(uid, tipo, x, y)] dos inimigos que nascem no chunk (cx, cy)."""
+        if not (0 <= cx < self.chunk_cols and 0 <= cy < self.chunk_rows):
+            return []
+        k = cy * self.chunk_cols + cx
+        pairs, entities = self.chunk_pairs, self.entities
+        out = []
+        for j in range(self.chunk_starts[k], self.chunk_starts[k + 1]):
+            kind, x, y = entities[pairs[2 * j]]
+            out.append((pairs[2 * j + 1], kind, x, y))
+        return out
+
+    @classmethod
+    def from_rows(cls, rows, name="", spawn_min_row=None, path=None):
+        """Compila um grid ASCII (lista de strings) em memoria."""
+        n_rows = len(rows)
+        n_cols = max((len(row) for row in rows), default=0)
+        if spawn_min_row is None:
+            spawn_min_row = max(n_rows - 4, 0)
+        tiles = bytearray(n_rows * n_cols)
+        entities = []
+        spawn_pos = spawn_rect = None
+        for r, row in enumerate(rows):
+            base = r * n_cols
+            for c, char in enumerate(row):
+                code = TILE_CODES.get(char)
+                if code is not None:
+                    tiles[base + c] = code
+                x = c * BLOCK_SIZE + (BLOCK_SIZE // 2)
+                y = r * BLOCK_SIZE + (BLOCK_SIZE // 2)
+                if char == "C" and r >= spawn_min_row:
+                    # Castelo inferior: spawn do heroi (o ultimo encontrado vale)
+                    spawn_pos = (x, r * BLOCK_SIZE)
+                    spawn_rect = (c * BLOCK_SIZE, r * BLOCK_SIZE, BLOCK_SIZE * 2, BLOCK_SIZE)
+                elif char in ENTITY_CODES:
+                    entities.append((ENTITY_CODES[char], x, y + 10))
+        return cls(name, n_cols, n_rows, tiles, entities, spawn_pos, spawn_rect, path)
+
+    def to_bytes(self, src_mtime_ns=0, src_size=0):
+        name = self.name.encode("utf-8")
+        has_spawn = self.spawn_pos is not None
+        spawn = (self.spawn_pos or (0, 0)) + (self.spawn_rect or (0, 0, 0, 0))
+        has_princess = self.princess is not None
+        parts = [HEADER.pack(MAGIC, VERSION, src_mtime_ns, src_size, self.cols, self.rows,
+                             len(self.entities), has_spawn, *spawn, has_princess,
+                             *(self.princess or (0, 0)), self.chunk_tiles, len(name)),
+                 name, bytes(self.tiles)]
+        parts += [ENTITY.pack(*e) for e in self.entities]
+        # Indice por chunk alinhado em 4 bytes (lido direto do mmap como uint32)
+        size = sum(map(len, parts))
+        parts.append(bytes(-size % 4))
+        parts.append(_pack_uint32s(self.chunk_starts))
+        parts.append(_pack_uint32s(self.chunk_pairs))
+        return b"".join(parts)
+
+
+def parse_level_text(text, path=None):
+    """Le o formato texto (metadados, `---`, grid) e devolve um Level."""
+    meta = {}
+    lines = text.splitlines()
+    if "---" not in lines:
+        raise LevelError(f"{path or 'nivel'}: falta a linha '---' antes do grid")
+    sep = lines.index("---")
+    for line in lines[:sep]:
+        line = line.strip()
+        if not line or line.startswith("#"): continue
+        key, _, value = line.partition("=")
+        meta[key.strip()] = value.strip()
+    rows = [row for row in lines[sep + 1:] if row.strip()]
+    if not rows:
+        raise LevelError(f"{path or 'nivel'}: grid vazio")
+    spawn_min_row = int(meta["spawn_min_row"]) if "spawn_min_row" in meta else None
+    return Level.from_rows(rows, meta.get("name", ""), spawn_min_row, path)
+
+
+def compiled_path(path):
+    return os.path.splitext(path)[0] + COMPILED_EXT
+
+
+def compile_level(path):
+    """Compila o fonte e grava o `.lvlc`; devolve o Level em memoria."""
+    st = os.stat(path)
+    with open(path, encoding="utf-8") as f:
+        level = parse_level_text(f.read(), path)
+    data = level.to_bytes(st.st_mtime_ns, st.st_size)
+    out = compiled_path(path)
+    try:
+        tmp = out + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out)
+    except OSError:
+        pass  # Pasta somente leitura: usa so a versao em memoria
+    return level
+
+
+def open_compiled(path, src_stat):
+    """Mapeia o `.lvlc` se ele ainda corresponde ao fonte; senao None."""
+    try:
+        with open(compiled_path(path), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mm) < HEADER.size:
+        return None
+    magic, version = struct.unpack_from("<4sH", mm, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+    (magic, version, mtime_ns, size, cols, rows, n_ent, has_spawn, sx, sy, rx, ry, rw, rh,
+     has_princess, kx, ky, chunk_tiles, name_len) = HEADER.unpack_from(mm, 0)
+    if mtime_ns != src_stat.st_mtime_ns or size != src_stat.st_size:
+        return None
+    view = memoryview(mm)
+    off = HEADER.size
+    name = bytes(view[off:off + name_len]).decode("utf-8")
+    off += name_len
+    tiles = view[off:off + cols * rows]
+    off += cols * rows
+    entities = EntityTable(view[off:off + n_ent * ENTITY.size], n_ent)
+    off += n_ent * ENTITY.size
+    off += -off % 4
+    n_chunks = -(-cols // chunk_tiles) * -(-rows // chunk_tiles)
+    if len(mm) < off + 4 * (n_chunks + 1):
+        return None
+    starts = _uint32s(view[off:off + 4 * (n_chunks + 1)])
+    off += 4 * (n_chunks + 1)
+    n_enemies = starts[-1]
+    if len(mm) != off + 8 * n_enemies:
+        return None
+    pairs = _uint32s(view[off:off + 8 * n_enemies])
+    spawn_pos = (sx, sy) if has_spawn else None
+    spawn_rect = (rx, ry, rw, rh) if has_spawn else None
+    index = ((kx, ky) if has_princess else None, starts, pairs)
+    return Level(name, cols, rows, tiles, entities, spawn_pos, spawn_rect, path, index, chunk_tiles)
+
+
+_loaded = {}  # caminho -> (mtime_ns, tamanho, Level)
+
+def load_level(path):
+    """Carrega um nivel pelo cache (memoria, depois `.lvlc`), compilando so se preciso."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    cached = _loaded.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    level = open_compiled(path, st) or compile_level(path)
+    _loaded[path] = (st.st_mtime_ns, st.st_size, level)
+    return level
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or ["levels"]:
+        paths = [os.path.join(arg, f) for f in sorted(os.listdir(arg)) if f.endswith(".txt")] \
+            if os.path.isdir(arg) else [arg]
+        for p in paths:
+            lvl = compile_level(p)
+            print(f"{p}: {lvl.cols}x{lvl.rows}, {len(lvl.entities)} entidades -> {compiled_path(p)}")
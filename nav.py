@@ -0,0 +1,446 @@
+"""Grafo de navegacao e alcancabilidade dos niveis (validacao de pacotes).
+
+Os nos do grafo sao "bordas": trechos continuos de chao em que o heroi
+anda sem cair. Cada coluna de uma borda vira ponto de partida de um
+conjunto fixo de manobras (pular segurando a direcao por N ticks, com ou
+sem atraso; andar ate cair da beirada), simuladas com as mesmas regras do
+Player.update (JUMP_STRENGTH, GRAVITY/GRAVITY_CARRYING,
+PLAYER_SPEED/PLAYER_SPEED_CARRYING, deslizar na parede, bater a cabeca,
+tolerancia de 10 px no pouso). Todas as manobras de um nivel rodam juntas,
+em vetores do NumPy; onde cada uma pousa vira uma aresta.
+
+O modelo eh conservador: so conta a princesa pega com o heroi em pe perto
+dela e manobras fora do conjunto nao entram. Nivel aprovado eh
+solucionavel; um reprovado pode depender de uma manobra mais fina.
+
+Editar um tile (LevelNav.set_tile) so refaz as manobras cuja area varrida
+inclui aquela celula; a alcancabilidade (BFS) eh refeita quando pedida.
+
+    python nav.py levels/            # valida todos os niveis da pasta
+    python nav.py pack/ --workers 8  # em paralelo, um processo por nucleo
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import engine
+from engine import BLOCK_SIZE, ENT_PRINCESS, TileGrid
+
+# Manobras a partir de cada coluna de chao: (pulo, atraso, ticks segurando)
+NAV_DELAYS = (0, 10)
+NAV_HOLDS = (0, 4, 8, 14, 22, None)  # None = segura ate pousar
+NAV_DROP_HOLDS = (4, 10, 20, None)   # Andar ate cair da beirada
+NAV_MAX_TICKS = 240                  # Quedas mais longas nao contam
+PICKUP_DIST = 50                     # Mesmo raio do Game.on_touch_princess
+HALF_W, BODY_H = 15, 50              # Hitbox do Player (30x50, pes no meio da base)
+# Faixas de x dentro da coluna com as mesmas colunas sob a hitbox:
+# 0 = [0, 15) pega a coluna da esquerda, 1 = [15, 26) so a propria, 2 = [26, 40) a da direita
+SLOT_X = ((0, 14), (15, 25), (26, BLOCK_SIZE - 1))
+SLOTS = 3
+
+
+def programs():
+    """(direcao, pulo, atraso, ticks segurando) de cada manobra; hold -1 = ate o fim."""
+    out = []
+    for d in (-1, 1):
+        for delay in NAV_DELAYS:
+            for hold in NAV_HOLDS:
+                if hold == 0 and delay:
+                    continue  # Pulo reto: o atraso nao muda nada
+                out.append((d, True, delay, -1 if hold is None else hold))
+        for hold in NAV_DROP_HOLDS:
+            out.append((d, False, 0, -1 if hold is None else hold))
+    return out
+
+PROGRAMS = programs()
+
+
+class NavGraph:
+    """Bordas e arestas de um TileGrid num modo de movimento (com ou sem princesa).
+
+    Uma posicao em pe eh um "slot" (linha, coluna, faixa de x); slots
+    vizinhos validos formam uma borda, identificada pelo slot mais a
+    esquerda. As arestas saem de cada (linha, coluna, direcao) de partida.
+    """
+    def __init__(self, tiles, carrying=False, world_w=None, world_h=None, princess=None, spawn_rect=None):
+        self.tiles = tiles
+        self.carrying = carrying
+        self.cols, self.rows = tiles.cols, tiles.rows
+        self.world_w = world_w or max(self.cols * BLOCK_SIZE, engine.WIDTH)
+        self.world_h = world_h or max(self.rows * BLOCK_SIZE, engine.HEIGHT)
+        self.princess = princess      # (x, y) para marcar manobras que pegam a princesa
+        self.spawn_rect = spawn_rect  # (x, y, w, h) para marcar manobras que chegam ao spawn
+        # Grid solido com borda vazia (como o tile_at fora do mapa), cobrindo o mundo todo
+        # e a folga de um pulo acima e de um tick de queda abaixo: dispensa checar limites
+        self.pad_top, self.pad_left = 8, 2
+        pad_bottom = int(NAV_MAX_TICKS * max(engine.GRAVITY, engine.GRAVITY_CARRYING)) // BLOCK_SIZE + 3
+        self.pcols = max(self.cols, -(-self.world_w // BLOCK_SIZE)) + 2 * self.pad_left
+        self.prows = max(self.rows, -(-self.world_h // BLOCK_SIZE)) + self.pad_top + pad_bottom
+        self.solid = np.zeros((self.prows, self.pcols), dtype=bool)
+        cells = np.frombuffer(bytes(tiles.cells), dtype=np.uint8).reshape(self.rows, self.cols)
+        self.solid[self.pad_top:self.pad_top + self.rows, self.pad_left:self.pad_left + self.cols] = cells != 0
+        self.valid = np.zeros((self.rows, self.cols, SLOTS), dtype=bool)
+        self.ledge = np.full((self.rows, self.cols, SLOTS), -1, dtype=np.int64)
+        self.edges = {}  # (linha, coluna, direcao) -> set de slots de pouso
+        self.grabs = {}  # (linha, coluna, direcao) -> (pega a princesa, chega ao spawn)
+        self.boxes = {}  # (linha, coluna, direcao) -> (r0, r1, c0, c1) varrido pelas manobras
+        self.src = {}    # (linha, coluna, direcao) -> slot de partida
+        self.version = 0
+        self._update_slots(0, self.rows)
+        self._simulate(self.starts(0, self.rows, 0, self.cols))
+
+    # --- posicoes em pe ---
+
+    def _s(self, rows, cols):
+        return self.solid[rows + self.pad_top, cols + self.pad_left]
+
+    def _update_slots(self, r0, r1):
+        """Recalcula validade e bordas das linhas [r0, r1)."""
+        r0, r1 = max(r0, 0), min(r1, self.rows)
+        if r0 >= r1:
+            return
+        rows = np.arange(r0, r1)[:, None]
+        cols = np.arange(self.cols)[None, :]
+        empty = lambda c: ~self._s(rows, c) & ~self._s(rows - 1, c)
+        floor = lambda c: self._s(rows + 1, c)
+        inside = lambda c: (c >= 0) & (c < self.cols)
+        left, right = cols - 1, cols + 1
+        self.valid[r0:r1, :, 0] = inside(left) & empty(left) & empty(cols) & (floor(left) | floor(cols))
+        self.valid[r0:r1, :, 1] = empty(cols) & floor(cols)
+        self.valid[r0:r1, :, 2] = inside(right) & empty(cols) & empty(right) & (floor(cols) | floor(right))
+        # Bordas: slots validos seguidos na linha; id = indice do primeiro
+        flat = self.valid[r0:r1].reshape(r1 - r0, -1)
+        idx = np.arange(flat.shape[1])
+        starts = flat & ~np.concatenate([np.zeros((r1 - r0, 1), bool), flat[:, :-1]], axis=1)
+        first = np.maximum.accumulate(np.where(starts, idx, -1), axis=1)
+        base = (np.arange(r0, r1) * self.cols * SLOTS)[:, None]
+        self.ledge[r0:r1] = np.where(flat, first + base, -1).reshape(r1 - r0, self.cols, SLOTS)
+
+    def starts(self, r0, r1, c0, c1):
+        """(linha, coluna, direcao, x inicial, slot) das partidas no retangulo dado.
+
+        Cada coluna com chao tem duas: da ponta esquerda indo para a esquerda e
+        da ponta direita indo para a direita (nao ha aceleracao no Player).
+        """
+        out = []
+        for r in range(max(r0, 0), min(r1, self.rows)):
+            for c in range(max(c0, 0), min(c1, self.cols)):
+                v = self.valid[r, c]
+                if not v.any():
+                    continue
+                lo = next(s for s in range(SLOTS) if v[s])
+                hi = next(s for s in reversed(range(SLOTS)) if v[s])
+                slot = (r * self.cols + c) * SLOTS
+                out.append((r, c, -1, c * BLOCK_SIZE + SLOT_X[lo][0], slot + lo))
+                out.append((r, c, 1, c * BLOCK_SIZE + SLOT_X[hi][1], slot + hi))
+        return out
+
+    def slot_of(self, x, y):
+        """Indice do slot de quem esta com os pes em (x, y)."""
+        c = int(x) // BLOCK_SIZE
+        rel = x - c * BLOCK_SIZE
+        s = 0 if rel < SLOT_X[1][0] else 1 if rel < SLOT_X[2][0] else 2
+        return ((int(y) // BLOCK_SIZE - 1) * self.cols + c) * SLOTS + s
+
+    # --- manobras ---
+
+    def _simulate(self, starts):
+        """Roda todas as manobras das partidas dadas e guarda pousos e caixas varridas."""
+        if not starts:
+            return
+        progs = PROGRAMS
+        n_p = len(progs)
+        st = np.array([s[:4] for s in starts], dtype=np.float64)
+        pd = np.array([p[0] for p in progs], dtype=np.float64)
+        start_of = np.repeat(np.arange(len(starts)), n_p)
+        prog_of = np.tile(np.arange(n_p), len(starts))
+        keep = pd[prog_of] == st[start_of, 2]  # Cada partida so usa as manobras da sua direcao
+        start_of, prog_of = start_of[keep], prog_of[keep]
+        n = len(start_of)
+
+        bs = BLOCK_SIZE
+        speed = engine.PLAYER_SPEED_CARRYING if self.carrying else engine.PLAYER_SPEED
+        grav = engine.GRAVITY_CARRYING if self.carrying else engine.GRAVITY
+        d = pd[prog_of]
+        jump = np.array([p[1] for p in progs])[prog_of]
+        delay = np.array([p[2] for p in progs])[prog_of]
+        hold = np.array([p[3] for p in progs])[prog_of]
+        hold = np.where(hold < 0, NAV_MAX_TICKS + 1, hold)
+
+        x = st[start_of, 3].copy()
+        y = (st[start_of, 0] + 1) * bs
+        vy = np.where(jump, float(engine.JUMP_STRENGTH), 0.0)
+        alive = np.ones(n, dtype=bool)
+        air = np.zeros(n, dtype=bool)
+        land = np.full(n, -1, dtype=np.int64)
+        grab = np.zeros(n, dtype=bool)
+        home = np.zeros(n, dtype=bool)
+        r_min = np.full(n, 1 << 30); r_max = np.full(n, -(1 << 30))
+        c_min = np.full(n, 1 << 30); c_max = np.full(n, -(1 << 30))
+        flat = self.solid.ravel()
+        pt, pl, w = self.pad_top, self.pad_left, self.pcols
+
+        def cell(r, c):
+            return flat[(r + pt) * w + c + pl]
+
+        def box(xx, yy):
+            """Colunas e linhas (a, b) cobertas pela hitbox, como no TileGrid.solids_in."""
+            left = (xx - HALF_W).astype(np.int64)
+            top = (yy - BODY_H).astype(np.int64)
+            return left // bs, (left + 2 * HALF_W - 1) // bs, top // bs, (top + BODY_H - 1) // bs
+
+        def track(ca, cb, ra, rb):
+            np.minimum(r_min, ra, out=r_min); np.maximum(r_max, rb, out=r_max)
+            np.minimum(c_min, ca, out=c_min); np.maximum(c_max, cb, out=c_max)
+
+        for t in range(NAV_MAX_TICKS):
+            if not alive.any():
+                break
+            dx = np.where((t >= delay) & (t < delay + hold), d * speed, 0.0)
+            vy = vy + grav
+            # Horizontal (com os limites do mundo e o deslize na parede)
+            x = np.clip(x + dx, HALF_W, self.world_w - HALF_W)
+            ca, cb, ra, rb = box(x, y)
+            track(ca, cb, ra, rb)
+            hit_a = cell(ra, ca) | ((ra + 1 <= rb) & cell(ra + 1, ca)) | ((ra + 2 <= rb) & cell(ra + 2, ca))
+            hit_b = cell(ra, cb) | ((ra + 1 <= rb) & cell(ra + 1, cb)) | ((ra + 2 <= rb) & cell(ra + 2, cb))
+            right = np.where(hit_b, cb * bs - HALF_W, np.where(hit_a, ca * bs - HALF_W, x))
+            left = np.where(hit_a, (ca + 1) * bs + HALF_W, np.where(hit_b, (cb + 1) * bs + HALF_W, x))
+            x = np.where(dx > 0, right, np.where(dx < 0, left, x))
+            # Vertical: pousa na primeira linha solida dentro da tolerancia, ou bate a cabeca
+            y = y + vy
+            ca, cb, ra, rb = box(x, y)
+            track(ca, cb, ra, rb)
+            on_ground = np.zeros(n, dtype=bool)
+            new_y = y.copy()
+            new_vy = vy.copy()
+            done = np.zeros(n, dtype=bool)
+            y_prev = y - vy
+            for k in range(3):
+                row = ra + k
+                hit = (row <= rb) & (cell(row, ca) | cell(row, cb)) & ~done
+                down = hit & (vy > 0) & (y_prev <= row * bs + 10)
+                up = hit & (vy < 0)
+                new_y = np.where(down, row * bs, np.where(up, (row + 1) * bs + BODY_H, new_y))
+                new_vy = np.where(down | up, 0.0, new_vy)
+                on_ground |= down
+                done |= down | up
+            y, vy = new_y, new_vy
+            # Rede de seguranca do chao do mundo
+            below = y > self.world_h
+            y = np.where(below, float(self.world_h), y)
+            vy = np.where(below, 0.0, vy)
+            on_ground |= below
+
+            if self.princess is not None:
+                px, py = self.princess
+                grab |= alive & ((x - px) ** 2 + (y - py) ** 2 < PICKUP_DIST * PICKUP_DIST)
+            if self.spawn_rect is not None:
+                sx, sy, sw, sh = self.spawn_rect
+                ix, iy = x.astype(np.int64), y.astype(np.int64)
+                home |= alive & (ix < sx + sw) & (ix + 10 > sx) & (iy < sy + sh) & (iy + 10 > sy)
+            landed = alive & on_ground & air
+            if landed.any():
+                ix = x.astype(np.int64)
+                c = ix // bs
+                rel = x - c * bs
+                s = np.where(rel < SLOT_X[1][0], 0, np.where(rel < SLOT_X[2][0], 1, 2))
+                r = y.astype(np.int64) // bs - 1
+                land = np.where(landed, (r * self.cols + c) * SLOTS + s, land)
+                alive &= ~landed
+            air |= ~on_ground
+            # Soltou a direcao sem sair do chao: nao sai mais do lugar
+            alive &= air | (t + 1 < delay + hold)
+
+        # Junta as manobras de cada partida
+        m = len(starts)
+        lo_r = np.full(m, 1 << 30); np.minimum.at(lo_r, start_of, r_min)
+        hi_r = np.full(m, -(1 << 30)); np.maximum.at(hi_r, start_of, r_max)
+        lo_c = np.full(m, 1 << 30); np.minimum.at(lo_c, start_of, c_min)
+        hi_c = np.full(m, -(1 << 30)); np.maximum.at(hi_c, start_of, c_max)
+        grabbed = np.zeros(m, dtype=bool); np.logical_or.at(grabbed, start_of, grab)
+        homed = np.zeros(m, dtype=bool); np.logical_or.at(homed, start_of, home)
+        for i, start in enumerate(starts):
+            key = start[:3]
+            self.src[key] = start[4]
+            self.edges[key] = set()
+            self.grabs[key] = (bool(grabbed[i]), bool(homed[i]))
+            self.boxes[key] = (int(lo_r[i]), int(hi_r[i]), int(lo_c[i]), int(hi_c[i]))
+        for j in np.nonzero(land >= 0)[0]:
+            self.edges[starts[start_of[j]][:3]].add(int(land[j]))
+
+    # --- edicao ---
+
+    def tile_changed(self, col, row):
+        """Atualiza o grafo depois de TileGrid.set_tile(col, row, ...)."""
+        self.solid[row + self.pad_top, col + self.pad_left] = self.tiles.tile_at(col, row) != 0
+        self._update_slots(row - 1, row + 2)
+        # Partidas cuja area varrida inclui a celula, mais as que mudaram de posicao
+        stale = {k for k, (r0, r1, c0, c1) in self.boxes.items() if r0 <= row <= r1 and c0 <= col <= c1}
+        stale |= {k for k in self.edges if row - 1 <= k[0] <= row + 1 and col - 1 <= k[1] <= col + 1}
+        for k in stale:
+            del self.edges[k], self.grabs[k], self.boxes[k], self.src[k]
+        redo = {s[:3]: s for s in self.starts(row - 1, row + 2, col - 1, col + 2)}
+        for r, c, d in stale:
+            for s in self.starts(r, r + 1, c, c + 1):
+                if s[2] == d:
+                    redo[s[:3]] = s
+        self._simulate(list(redo.values()))
+        self.version += 1
+        return len(redo)
+
+    # --- consultas ---
+
+    def ledge_of_slot(self, slot):
+        if slot < 0 or slot >= self.ledge.size:
+            return -1
+        return int(self.ledge.flat[slot])
+
+    def ledge_edges(self):
+        """borda -> set de bordas alcancaveis por uma manobra."""
+        out = {}
+        for key, slots in self.edges.items():
+            src = self.ledge_of_slot(self.src[key])
+            targets = out.setdefault(src, set())
+            for slot in slots:
+                dst = self.ledge_of_slot(slot)
+                if dst >= 0 and dst != src:
+                    targets.add(dst)
+        return out
+
+    def reachable(self, sources):
+        """Bordas alcancaveis (BFS) a partir das bordas em `sources`."""
+        edges = self.ledge_edges()
+        seen = {s for s in sources if s >= 0}
+        queue = deque(seen)
+        while queue:
+            for nxt in edges.get(queue.popleft(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        return seen
+
+    def ledge_starts(self, ledges, flag):
+        """Alguma partida das bordas dadas tem a marca `flag` (0 = princesa, 1 = spawn)?"""
+        return any(g[flag] for k, g in self.grabs.items() if self.ledge_of_slot(self.src[k]) in ledges)
+
+    def slots_near(self, test):
+        """Bordas com algum slot onde `test(x_min, x_max, pes)` eh verdadeiro."""
+        out = set()
+        for r, c, s in zip(*np.nonzero(self.valid)):
+            lo, hi = SLOT_X[s]
+            if test(c * BLOCK_SIZE + lo, c * BLOCK_SIZE + hi, (r + 1) * BLOCK_SIZE):
+                out.add(int(self.ledge[r, c, s]))
+        return out
+
+
+class LevelNav:
+    """Alcancabilidade de um nivel: spawn -> princesa a pe e princesa -> spawn carregando.
+
+    Guarda o resultado de `check()` ate a proxima edicao de tile.
+    """
+    def __init__(self, level, tiles=None):
+        self.level = level
+        self.tiles = tiles or TileGrid(level.cols, level.rows, bytearray(level.tiles))
+        # Mesmos padroes do Game.reset_game quando o nivel nao tem spawn
+        self.spawn_pos = level.spawn_pos or (100, 520)
+        self.spawn_rect = level.spawn_rect or (80, 520, 80, 40)
+        self.princess_pos = None
+        for kind, x, y in level.entities:
+            if kind == ENT_PRINCESS:
+                self.princess_pos = (x, y)
+        self.walk = NavGraph(self.tiles, False, princess=self.princess_pos)
+        self.carry = NavGraph(self.tiles, True, spawn_rect=self.spawn_rect)
+        self._result = None
+
+    def set_tile(self, col, row, code):
+        """Edita um tile e refaz so as manobras que passam por ele."""
+        self.tiles.set_tile(col, row, code)
+        self.walk.tile_changed(col, row)
+        self.carry.tile_changed(col, row)
+        self._result = None
+
+    def check(self):
+        """(solucionavel, motivo)."""
+        if self._result is None:
+            self._result = self._check()
+        return self._result
+
+    def solvable(self):
+        return self.check()[0]
+
+    def _check(self):
+        if self.princess_pos is None:
+            return False, "nivel sem princesa (K)"
+        spawn = self.walk.ledge_of_slot(self.walk.slot_of(*self.spawn_pos))
+        if spawn < 0:
+            return False, "spawn sem chao"
+        reached = self.walk.reachable([spawn])
+        px, py = self.princess_pos
+
+        def near_princess(x0, x1, feet):
+            dx = max(x0 - px, 0, px - x1)
+            return dx * dx + (feet - py) ** 2 < PICKUP_DIST * PICKUP_DIST
+        pickups = self.walk.slots_near(near_princess) & reached
+        if not pickups:
+            if self.walk.ledge_starts(reached, 0):
+                return False, "princesa so eh alcancada no ar (fora do modelo)"
+            return False, "princesa inalcancavel a partir do spawn"
+        back = self.carry.reachable(pickups)
+        rx, ry, rw, rh = self.spawn_rect
+
+        def at_spawn(x0, x1, feet):
+            return x0 < rx + rw and x1 + 10 > rx and feet < ry + rh and feet + 10 > ry
+        if not (self.carry.slots_near(at_spawn) & back) and not self.carry.ledge_starts(back, 1):
+            return False, "sem caminho de volta ao spawn carregando a princesa"
+        return True, "ok"
+
+
+# --- CLI ---
+
+def validate(path):
+    """(caminho, solucionavel, motivo) de um arquivo de nivel."""
+    from level import load_level, LevelError
+    try:
+        ok, reason = LevelNav(load_level(path)).check()
+    except (LevelError, OSError) as e:
+        ok, reason = False, str(e)
+    return path, ok, reason
+
+def validate_pack(paths, workers=None):
+    """Valida varios niveis num pool de processos; devolve [(caminho, ok, motivo)]."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        return [validate(p) for p in paths]
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(validate, paths, chunksize=chunksize))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida se os niveis sao solucionaveis.")
+    parser.add_argument("paths", nargs="*", default=["levels"], help="arquivos .txt ou pastas")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrao: todos os nucleos)")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for arg in args.paths:
+        if os.path.isdir(arg):
+            paths += [os.path.join(arg, f) for f in sorted(os.listdir(arg)) if f.endswith(".txt")]
+        else:
+            paths.append(arg)
+    t = time.perf_counter()
+    results = validate_pack(paths, args.workers)
+    failed = [(p, reason) for p, ok, reason in results if not ok]
+    for p, reason in failed:
+        print(f"FALHA {p}: {reason}")
+    print(f"{len(results)} niveis, {len(results) - len(failed)} ok, {len(failed)} com falha "
+          f"em {time.perf_counter() - t:.2f} s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
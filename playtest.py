@@ -0,0 +1,244 @@
+"""Playtests em lote: roda muitas partidas headless em paralelo e resume.
+
+Cada episodio vai do spawn ate vitoria, fim de jogo ou limite de ticks,
+com uma politica de entrada (aleatoria ou scriptada) e seed propria.
+
+    python playtest.py -n 10000 --policy greedy --set GRAVITY_CARRYING=0.9
+
+Uso pela API:
+
+    from playtest import run_batch, summarize
+    summary = summarize(run_batch(1000, policy="random", workers=8))
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import engine
+from engine import Game, InputState, STATE_PLAYING, STATE_VICTORY, STATE_GAME_OVER
+
+MAX_TICKS = 60 * 180  # 3 minutos de jogo
+
+
+# --- POLITICAS DE ENTRADA ---
+
+class RandomPolicy:
+    """Segura uma combinacao aleatoria de teclas por alguns ticks."""
+    def __init__(self, rng):
+        self.rng = rng
+        self.hold = 0
+        self.keys = InputState()
+
+    def __call__(self, game):
+        if self.hold <= 0:
+            r = self.rng
+            move = r.random()
+            self.keys = InputState(left=move < 0.35, right=move > 0.65, space=r.random() < 0.3)
+            self.hold = r.randint(5, 40)
+        self.hold -= 1
+        return self.keys
+
+class GreedyPolicy:
+    """Anda na direcao do objetivo (princesa, depois spawn), pulando com ruido."""
+    def __init__(self, rng, noise=0.1):
+        self.rng = rng
+        self.noise = noise
+        self.last_x = None
+        self.stuck = 0
+
+    def __call__(self, game):
+        p = game.player
+        if p.carrying or game.princess is None:
+            tx, ty = game.spawn_rect.centerx, game.spawn_rect.bottom
+        else:
+            tx, ty = game.princess.x, game.princess.y
+        self.stuck = self.stuck + 1 if p.x == self.last_x else 0
+        self.last_x = p.x
+        r = self.rng
+        right = tx > p.x
+        if r.random() < self.noise:
+            right = not right
+        jump = self.stuck > 3 or (ty < p.y - 20 and r.random() < 0.2) or r.random() < 0.02
+        return InputState(left=not right, right=right, space=jump)
+
+class IdlePolicy:
+    """Nao aperta nada (linha de base)."""
+    def __init__(self, rng):
+        self.keys = InputState()
+
+    def __call__(self, game):
+        return self.keys
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy, "idle": IdlePolicy}
+
+
+# --- EPISODIOS ---
+
+# Constantes calculadas a partir de outras: refeitas depois de cada override
+# (a nao ser que a propria derivada tambem tenha sido sobrescrita)
+DERIVED = {
+    "GRAVITY_CARRYING": lambda e: e.GRAVITY * e.CARRY_GRAVITY_SCALE,
+    "PLAYER_SPEED_CARRYING": lambda e: e.PLAYER_SPEED * e.CARRY_SPEED_SCALE,
+    "AI_MAX_SLEEP": lambda e: e.AI_MAX_CATCHUP - e.AI_NEAR_INTERVAL,
+}
+# Constantes que o engine le a cada uso. As demais (WIDTH, GRID_CELL, CHUNK_SIZE...)
+# sao copiadas em argumentos padrao, em outras constantes ou em outros modulos
+# na importacao: trocar depois nao teria efeito, entao o override eh recusado
+TUNABLE = {
+    "GRAVITY", "CARRY_GRAVITY_SCALE", "GRAVITY_CARRYING", "PLAYER_SPEED", "CARRY_SPEED_SCALE",
+    "PLAYER_SPEED_CARRYING", "JUMP_STRENGTH", "PATROL_RADIUS", "PROJECTILE_SIZE", "STREAM_MIN_CELLS",
+    "AI_VISIBLE_MARGIN", "AI_NEAR_INTERVAL", "AI_MAX_CATCHUP", "AI_MAX_SLEEP",
+}
+
+def apply_overrides(overrides):
+    """Troca constantes de tuning do engine (ex.: {"GRAVITY_CARRYING": 0.9}).
+
+    Refaz as derivadas (DERIVED) e devolve os valores antigos de tudo que
+    mudou, para restore_overrides.
+    """
+    overrides = overrides or {}
+    for name, value in overrides.items():
+        old = getattr(engine, name, None)
+        if not name.isupper() or type(old) not in (int, float, bool):
+            raise ValueError(f"constante desconhecida: {name}")
+        if name not in TUNABLE:
+            raise ValueError(f"constante nao ajustavel (lida so na importacao): {name}; "
+                             f"ajustaveis: {', '.join(sorted(TUNABLE))}")
+        if isinstance(old, bool) != isinstance(value, bool):
+            raise ValueError(f"{name}: esperado {type(old).__name__}, recebido {value!r}")
+    saved = {}
+    for name, value in overrides.items():
+        saved[name] = getattr(engine, name)
+        setattr(engine, name, value)
+    for name, formula in DERIVED.items():
+        if name not in overrides:
+            saved.setdefault(name, getattr(engine, name))
+            setattr(engine, name, formula(engine))
+    return saved
+
+def restore_overrides(saved):
+    for name, value in saved.items():
+        setattr(engine, name, value)
+
+@contextmanager
+def overridden(overrides):
+    """Aplica os overrides so dentro do bloco (no proprio processo)."""
+    saved = apply_overrides(overrides)
+    try:
+        yield
+    finally:
+        restore_overrides(saved)
+
+def run_episode(seed, policy="greedy", max_ticks=MAX_TICKS, level=None):
+    """Roda uma partida do spawn ate o fim e devolve as metricas dela."""
+    game = Game(seed=seed, level=level)
+    game.start()
+    agent = POLICIES[policy](random.Random(seed ^ 0x5EED))
+    while game.state == STATE_PLAYING and game.ticks < max_ticks:
+        game.step(agent(game))
+    if game.state == STATE_VICTORY:
+        outcome = "victory"
+    elif game.state == STATE_GAME_OVER:
+        outcome = "game_over"
+    else:
+        outcome = "timeout"
+    return {
+        "seed": seed,
+        "outcome": outcome,
+        "ticks": game.ticks,
+        "ticks_to_pickup": game.pickup_tick,
+        "ticks_to_victory": game.ticks if outcome == "victory" else None,
+        "lives_lost": len(game.player.hit_log),
+        "hit_causes": list(game.player.hit_log),
+    }
+
+def _episode(args):
+    return run_episode(*args)
+
+def run_batch(episodes, policy="greedy", workers=None, base_seed=0, max_ticks=MAX_TICKS,
+              level=None, overrides=None):
+    """Distribui `episodes` seeds (base_seed, base_seed+1, ...) num pool de processos."""
+    if policy not in POLICIES:
+        raise ValueError(f"politica desconhecida: {policy}")
+    jobs = [(base_seed + i, policy, max_ticks, level) for i in range(episodes)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        with overridden(overrides):
+            return [_episode(job) for job in jobs]
+    chunksize = max(1, episodes // (workers * 8))
+    with ProcessPoolExecutor(workers, initializer=apply_overrides, initargs=(overrides,)) as pool:
+        return list(pool.map(_episode, jobs, chunksize=chunksize))
+
+def _stats(values):
+    if not values:
+        return None
+    return {"mean": statistics.fmean(values), "median": statistics.median(values),
+            "min": min(values), "max": max(values)}
+
+def summarize(results):
+    """Agrega os episodios: taxas por resultado, tempos e causas de dano."""
+    n = len(results)
+    outcomes = Counter(r["outcome"] for r in results)
+    causes = Counter(c for r in results for c in r["hit_causes"])
+    return {
+        "episodes": n,
+        "outcomes": dict(outcomes),
+        "win_rate": outcomes["victory"] / n if n else 0.0,
+        "ticks_to_pickup": _stats([r["ticks_to_pickup"] for r in results if r["ticks_to_pickup"] is not None]),
+        "ticks_to_victory": _stats([r["ticks_to_victory"] for r in results if r["ticks_to_victory"] is not None]),
+        "lives_lost": _stats([r["lives_lost"] for r in results]),
+        "hit_causes": dict(causes),
+    }
+
+
+# --- CLI ---
+
+def _parse_value(text):
+    """bool (true/false), int ou float, nessa ordem."""
+    text = text.strip()
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def _parse_set(items):
+    overrides = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        overrides[name.strip()] = _parse_value(value)
+    return overrides
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Playtests em lote do Save The Princess.")
+    parser.add_argument("-n", "--episodes", type=int, default=1000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrao: todos os nucleos)")
+    parser.add_argument("--seed", type=int, default=0, help="seed do primeiro episodio")
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--level", default=None, help="arquivo de nivel (padrao: levels/level1.txt)")
+    parser.add_argument("--set", action="append", default=[], metavar="NOME=VALOR",
+                        help="sobrescreve constante do engine, ex.: GRAVITY_CARRYING=0.9")
+    parser.add_argument("--json", metavar="ARQUIVO", help="grava resumo e episodios em JSON")
+    args = parser.parse_args(argv)
+
+    overrides = _parse_set(args.set)
+    results = run_batch(args.episodes, args.policy, args.workers, args.seed, args.max_ticks,
+                        args.level, overrides)
+    summary = summarize(results)
+    summary["policy"] = args.policy
+    summary["overrides"] = overrides
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "episodes": results}, f)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Profiler de frame: tempo por subsistema, com custo zero quando desligado.
+
+Os pontos instrumentados sao metodos (Game.update, Player.update, cada
+inimigo, colisoes, Renderer.draw...). Ao ligar, o profiler troca esses
+metodos na classe por versoes cronometradas; ao desligar, devolve os
+originais, entao o jogo desligado roda exatamente o codigo de sempre.
+
+    python profiler.py --ticks 5000 --out trace.csv   # perfil headless
+"""
+import argparse
+import csv
+import functools
+import json
+import random
+import sys
+import time
+from collections import defaultdict, deque
+
+import engine
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Profiler:
+    """Acumula ms por rotulo em cada frame e guarda o historico recente."""
+    def __init__(self, history=600, max_trace=100000):
+        self.enabled = False
+        self.targets = []     # (classe, metodo, rotulo)
+        self._originals = []  # (classe, metodo, funcao original)
+        self.current = defaultdict(float)  # rotulo -> segundos no frame atual
+        self.frames = deque(maxlen=history)
+        self.trace = []
+        self.max_trace = max_trace
+        self.count_keys = set()  # colunas que sao contagens, nao tempos
+        self._last = None
+
+    def instrument(self, owner, attr, label):
+        """Registra `owner.attr` (metodo de classe) como ponto medido."""
+        self.targets.append((owner, attr, label))
+        if self.enabled:
+            self._patch(owner, attr, label)
+
+    def _patch(self, owner, attr, label):
+        fn = owner.__dict__[attr]
+        self._originals.append((owner, attr, fn))
+        setattr(owner, attr, self._timed(fn, label))
+
+    def _timed(self, fn, label):
+        current = self.current
+        perf = time.perf_counter
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            t = perf()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                current[label] += perf() - t
+        return timed
+
+    def enable(self):
+        if self.enabled: return
+        self.enabled = True
+        for owner, attr, label in self.targets:
+            self._patch(owner, attr, label)
+        self.current.clear()
+        self._last = time.perf_counter()
+
+    def disable(self):
+        if not self.enabled: return
+        self.enabled = False
+        for owner, attr, fn in reversed(self._originals):
+            setattr(owner, attr, fn)
+        self._originals.clear()
+
+    def toggle(self):
+        self.disable() if self.enabled else self.enable()
+        return self.enabled
+
+    def end_frame(self, **counts):
+        """Fecha o frame atual (chamar uma vez por frame, com contagens opcionais)."""
+        if not self.enabled: return
+        now = time.perf_counter()
+        record = {"time": now, "frame_ms": (now - self._last) * 1000.0}
+        self._last = now
+        for label, secs in self.current.items():
+            record[label] = secs * 1000.0
+        record.update(counts)
+        self.count_keys.update(counts)
+        self.current.clear()
+        self.frames.append(record)
+        if len(self.trace) < self.max_trace:
+            self.trace.append(record)
+
+    def summary(self):
+        """FPS, p50/p99 do frame e media por subsistema no historico recente."""
+        frames = list(self.frames)
+        if not frames:
+            return {}
+        frame_ms = [f["frame_ms"] for f in frames]
+        mean = sum(frame_ms) / len(frame_ms)
+        labels = sorted({k for f in frames for k in f} - {"time", "frame_ms"} - self.count_keys)
+        per = {k: sum(f.get(k, 0) for f in frames) / len(frames) for k in labels}
+        return {"fps": 1000.0 / mean if mean else 0.0, "p50_ms": _percentile(frame_ms, 0.5),
+                "p99_ms": _percentile(frame_ms, 0.99), "subsystems": per,
+                "counts": {k: frames[-1].get(k, 0) for k in sorted(self.count_keys)}}
+
+    def export(self, path):
+        """Grava o trace como JSON (`.json`) ou CSV (qualquer outra extensao)."""
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"summary": self.summary(), "frames": self.trace}, f)
+            return
+        columns = ["time", "frame_ms"] + sorted({k for r in self.trace for k in r} - {"time", "frame_ms"})
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, columns, restval=0)
+            writer.writeheader()
+            writer.writerows(self.trace)
+
+
+def instrument_engine(profiler):
+    """Pontos padrao da simulacao."""
+    profiler.instrument(engine.Game, "update", "update")
+    profiler.instrument(engine.Game, "step", "update/step")
+    profiler.instrument(engine.Player, "update", "update/player")
+    profiler.instrument(engine.AIScheduler, "update", "update/ai")
+    profiler.instrument(engine.FireEnemy, "update_batch", "update/ai/fire_enemy")
+    profiler.instrument(engine.SwordEnemy, "update_batch", "update/ai/sword_enemy")
+    profiler.instrument(engine.ProjectilePool, "update", "update/projectiles")
+    profiler.instrument(engine.TileGrid, "solids_in", "collision/tiles")
+    profiler.instrument(engine.Game, "collide", "collision/entities")
+
+def frame_counts(game):
+    """Contagens de entidades para o trace."""
+    if game.state != engine.STATE_PLAYING:
+        return {"enemies": 0, "active": 0, "ai_updates": 0, "projectiles": 0}
+    return {"enemies": len(game.enemies), "active": len(game.active_enemies),
+            "ai_updates": game.ai.updated, "projectiles": game.projectiles.count}
+
+PROFILER = Profiler()
+instrument_engine(PROFILER)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil headless da simulacao.")
+    parser.add_argument("--ticks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="trace em .csv ou .json")
+    args = parser.parse_args(argv)
+
+    from playtest import RandomPolicy
+    game = engine.Game(seed=args.seed)
+    game.start()
+    policy = RandomPolicy(random.Random(args.seed))
+    PROFILER.enable()
+    for _ in range(args.ticks):
+        if game.state != engine.STATE_PLAYING:
+            game.start()
+        game.step(policy(game))
+        PROFILER.end_frame(**frame_counts(game))
+    PROFILER.disable()
+    print(json.dumps(PROFILER.summary(), indent=2))
+    if args.out:
+        PROFILER.export(args.out)
+
+if __name__ == "__main__":
+    sys.exit(main())
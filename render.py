@@ -0,0 +1,411 @@
+"""Renderizacao do jogo (pgzero/pygame), separada do game.py.
+
+O Renderer monta cada frame como uma lista de (surface, pos) sobre um fundo
+e desenha na surface do display. Fica num modulo proprio para poder rodar
+sem o loop do pgzero (ex.: bench.py com driver de video dummy).
+"""
+from collections import Counter, OrderedDict
+import pygame
+from pgzero import ptext
+
+from assets import ASSETS
+from profiler import PROFILER
+from engine import (
+    WIDTH, HEIGHT, BLOCK_SIZE, PROJECTILE_IMAGES, Player, Princess, FireEnemy, SwordEnemy,
+    TILE_EMPTY, TILE_WALL, TILE_PLATFORM, TILE_CASTLE,
+    STATE_MENU, STATE_PLAYING, STATE_GAME_OVER, STATE_VICTORY,
+)
+
+SCALE_FACTOR = 1  # Escala dos personagens
+# Cores
+COLOR_BG = (20, 20, 30)
+COLOR_TEXT = (255, 255, 255)
+COLOR_BTN = (60, 60, 80)
+COLOR_SPAWN = (0, 100, 0)
+# Cor de cada tile: Parede escura, Plataforma cinza, Castelo avermelhado/marrom
+TILE_COLORS = {TILE_WALL: (40, 40, 50), TILE_PLATFORM: (100, 100, 120), TILE_CASTLE: (80, 50, 50)}
+# Texturas opcionais de images/ no lugar das cores chapadas
+USE_TILE_TEXTURES = False
+TILE_IMAGES = {TILE_WALL: "tile_ground", TILE_PLATFORM: "tile_platform", TILE_CASTLE: "tile_castle"}
+# Camada do nivel em pedacos de LAYER_CHUNK_TILES x LAYER_CHUNK_TILES tiles,
+# feitos sob demanda; so os pedacos visiveis ficam em memoria (LRU)
+LAYER_CHUNK_TILES = 16
+LAYER_MAX_CHUNKS = 24
+DRAW_MARGIN = BLOCK_SIZE  # Sprites ate essa distancia fora da tela ainda sao desenhados
+
+# O loop do pgzero sempre chama pygame.display.flip() depois do draw(); no
+# modo dirty-rect o game.py troca o flip por Renderer.present
+DISPLAY_FLIP = pygame.display.flip
+
+# --- HELPER: Atlas de Frames ---
+ATLAS_WIDTH = 1024  # Largura da surface do atlas; a altura cresce conforme os frames entram
+# Frames de todos os sprites e projeteis, empacotados juntos na primeira partida
+SPRITE_FRAMES = tuple(f for cls in (Player, Princess, FireEnemy, SwordEnemy) for f in cls.frame_names) + PROJECTILE_IMAGES
+
+class FrameAtlas:
+    """Todos os frames (pre-carregados pelo ASSETS) numa unica surface.
+
+    Cada frame eh escalado uma vez e copiado para uma prateleira do atlas;
+    o desenho usa (atlas, pos, regiao), entao a cena inteira sai num so
+    Surface.blits. Frames que nao estavam em SPRITE_FRAMES entram depois.
+    """
+    def __init__(self, width=ATLAS_WIDTH):
+        self.width = width
+        self.surface = None
+        self.regions = {}         # nome -> (x, y, w, h) no atlas
+        self.cursor = (0, 0, 0)   # x e y livres na prateleira atual, altura dela
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, names=SPRITE_FRAMES):
+        for name in names:
+            if name not in self.regions:
+                self.add(name)
+
+    def region(self, image_name):
+        area = self.regions.get(image_name)
+        if area is not None:
+            self.hits += 1
+            return area
+        self.misses += 1
+        return self.add(image_name)
+
+    def add(self, image_name):
+        surf = ASSETS.image(image_name)
+        w = int(surf.get_width() * SCALE_FACTOR)
+        h = int(surf.get_height() * SCALE_FACTOR)
+        if (w, h) != surf.get_size():
+            surf = pygame.transform.scale(surf, (w, h))
+        x, y, shelf = self.cursor
+        if x + w > self.width:
+            x, y, shelf = 0, y + shelf, 0
+        shelf = max(shelf, h)
+        self.reserve(y + shelf)
+        # Copia exata (com alfa): o atlas comeca transparente e as regioes nao se sobrepoem
+        self.surface.blit(surf, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+        area = self.regions[image_name] = (x, y, w, h)
+        self.cursor = (x + w, y, shelf)
+        return area
+
+    def reserve(self, height):
+        """Garante altura `height` no atlas (cresce dobrando e copia o que ja tinha)."""
+        old = self.surface
+        if old is not None and old.get_height() >= height:
+            return
+        if old is not None:
+            height = max(height, 2 * old.get_height())
+        surf = pygame.Surface((self.width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha()
+        surf.fill((0, 0, 0, 0))
+        if old is not None:
+            surf.blit(old, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        self.surface = surf
+
+    def item(self, image_name, x, y):
+        """Item (atlas, pos, regiao) com o centro do frame em (x, y)."""
+        area = self.region(image_name)
+        return self.surface, (int(x - area[2] / 2), int(y - area[3] / 2)), area
+
+    def stats(self):
+        """Contadores para conferir se o cache esta funcionando."""
+        size = self.surface.get_size() if self.surface is not None else (0, 0)
+        return {"frames": len(self.regions), "size": size, "hits": self.hits, "misses": self.misses}
+
+FRAME_ATLAS = FrameAtlas()
+
+# --- HELPER: Cache de Textos ---
+class TextCache:
+    """Surfaces de texto ja renderizadas, por (texto, tamanho, cor), com descarte LRU."""
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, fontsize=None, color=None):
+        key = (text, fontsize, color)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = ptext.getsurf(text, fontsize=fontsize, color=color, cache=False)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def stats(self):
+        return {"surfaces": len(self.surfaces), "hits": self.hits, "misses": self.misses}
+
+TEXT_CACHE = TextCache()
+
+# --- RENDER ---
+# A cena de cada frame eh uma lista de (surface, (x, y)) ou, para os sprites,
+# (atlas, (x, y), regiao), desenhada sobre um fundo (camada do nivel ou cor
+# lisa) num unico Surface.blits. No modo dirty-rect so as regioes que
+# mudaram desde o frame anterior sao redesenhadas e enviadas para a tela.
+
+def sprite_item(sprite, cam):
+    """Item de um AnimatedSprite com os pes (bottom-center) em (x, y), na tela da camera."""
+    area = FRAME_ATLAS.region(sprite.image)
+    w, h = area[2], area[3]
+    return FRAME_ATLAS.surface, (int(sprite.x - w / 2) - cam.x, int(sprite.y - h // 2 - h / 2) - cam.y), area
+
+def in_view(x, y, cam):
+    return (cam.x - DRAW_MARGIN <= x <= cam.x + cam.w + DRAW_MARGIN and
+            cam.y - DRAW_MARGIN <= y <= cam.y + cam.h + DRAW_MARGIN)
+
+def projectile_items(pool, cam):
+    items = []
+    areas = [FRAME_ATLAS.region(name) for name in PROJECTILE_IMAGES]
+    atlas = FRAME_ATLAS.surface  # Depois do region: ele pode ter realocado o atlas
+    for x, y, kind in pool.items():
+        if not in_view(x, y, cam): continue
+        area = areas[kind]
+        items.append((atlas, (int(x - area[2] / 2) - cam.x, int(y - area[3] / 2) - cam.y), area))
+    return items
+
+def item_rect(item):
+    """Area da tela coberta por um item da cena."""
+    size = item[2][2:] if len(item) > 2 else item[0].get_size()
+    return pygame.Rect(item[1], size)
+
+def text_item(text, fontsize=None, color=None, center=None, topleft=None):
+    """Item de texto posicionado como o screen.draw.text do pgzero."""
+    surf = TEXT_CACHE.get(text, fontsize, color)
+    if center is not None:
+        w, h = surf.get_size()
+        return surf, (int(round(center[0] - 0.5 * w)), int(round(center[1] - 0.5 * h)))
+    return surf, topleft
+
+class LevelLayer:
+    """Fundo, spawn e tiles do nivel pre-renderizados em pedacos.
+
+    Cada pedaco cobre LAYER_CHUNK_TILES x LAYER_CHUNK_TILES tiles e so eh
+    montado quando aparece na camera, entao o custo nao cresce com o mapa.
+    """
+    def __init__(self, game, max_chunks=LAYER_MAX_CHUNKS):
+        self.tiles = game.tiles
+        self.version = game.tiles.version  # Tiles editados (set_tile): refaz a camada
+        self.spawn_rect = game.spawn_rect
+        self.chunk_px = LAYER_CHUNK_TILES * BLOCK_SIZE
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()  # (cx, cy) -> Surface
+        self.textures = {}
+        if USE_TILE_TEXTURES:
+            for code, name in TILE_IMAGES.items():
+                self.textures[code] = pygame.transform.scale(ASSETS.image(name), (BLOCK_SIZE, BLOCK_SIZE))
+
+    def chunk(self, cx, cy):
+        surf = self.chunks.get((cx, cy))
+        if surf is not None:
+            self.chunks.move_to_end((cx, cy))
+            return surf
+        surf = self.build(cx, cy)
+        self.chunks[(cx, cy)] = surf
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return surf
+
+    def build(self, cx, cy):
+        tiles, n = self.tiles, LAYER_CHUNK_TILES
+        ox, oy = cx * self.chunk_px, cy * self.chunk_px
+        surf = pygame.Surface((self.chunk_px, self.chunk_px))
+        surf.fill(COLOR_BG)
+        surf.fill(COLOR_SPAWN, self.spawn_rect.move(-ox, -oy))
+        for r in range(cy * n, min((cy + 1) * n, tiles.rows)):
+            for c in range(cx * n, min((cx + 1) * n, tiles.cols)):
+                code = tiles.tile_at(c, r)
+                if code == TILE_EMPTY: continue
+                pos = (c * BLOCK_SIZE - ox, r * BLOCK_SIZE - oy)
+                if code in self.textures:
+                    surf.blit(self.textures[code], pos)
+                else:
+                    surf.fill(TILE_COLORS[code], pygame.Rect(pos, (BLOCK_SIZE, BLOCK_SIZE)))
+        return surf
+
+    def items(self, cam):
+        """(surface, pos na tela) dos pedacos que a camera enxerga."""
+        size = self.chunk_px
+        items = []
+        for cy in range(cam.y // size, (cam.y + cam.h - 1) // size + 1):
+            for cx in range(cam.x // size, (cam.x + cam.w - 1) // size + 1):
+                items.append((self.chunk(cx, cy), (cx * size - cam.x, cy * size - cam.y)))
+        return items
+
+class Renderer:
+    """Desenha o estado do Game na tela do pgzero."""
+    def __init__(self, dirty_rects=False):
+        # Camada estatica do nivel; refeita so quando o TileGrid muda
+        self.level_layer = None
+        self.plain_bg = None
+        self.buttons = {}  # tamanho -> Surface do fundo de botao
+        # HUD de vidas: so refaz o item quando Player.lives muda
+        self.hud_lives = None
+        self.hud_item = None
+        # Overlay do profiler (atualizado algumas vezes por segundo)
+        self.overlay_items = []
+        self.overlay_age = 0
+        # Dirty-rect: cena do frame anterior e regioes a enviar no flip
+        self.dirty_rects = dirty_rects
+        self.prev_bg_key = None
+        self.prev_items = None
+        self.dirty = None  # None = tela inteira
+        self.draw_calls = 0  # chamadas de blit/blits do ultimo frame
+
+    def background(self, game):
+        """(chave, itens) do fundo; a chave muda quando o fundo inteiro muda."""
+        if game.state == STATE_PLAYING:
+            layer = self.level_layer
+            if layer is None or layer.tiles is not game.tiles or layer.version != game.tiles.version:
+                self.level_layer = LevelLayer(game)
+            cam = game.camera
+            return (self.level_layer, cam.x, cam.y), self.level_layer.items(cam)
+        if self.plain_bg is None:
+            self.plain_bg = pygame.Surface((WIDTH, HEIGHT))
+            self.plain_bg.fill(COLOR_BG)
+        return self.plain_bg, [(self.plain_bg, (0, 0))]
+
+    def button_items(self, rect, txt, fontsize=None):
+        surf = self.buttons.get(rect.size)
+        if surf is None:
+            surf = self.buttons[rect.size] = pygame.Surface(rect.size)
+            surf.fill(COLOR_BTN)
+        return [(surf, rect.topleft), text_item(txt, fontsize, center=rect.center)]
+
+    def scene(self, game):
+        """Lista (surface, pos) do frame, em ordem de desenho."""
+        items = []
+        if game.state == STATE_MENU:
+            items.append(text_item("Save The Princess", 60, "orange", center=(WIDTH//2, 100)))
+            # Botoes
+            lbl_som = "SOM LIGADO" if game.music_on else "SOM DESLIGADO"
+            for btn, txt in [(game.btn_start, "JOGAR"), (game.btn_sound, lbl_som), (game.btn_exit, "SAIR")]:
+                items += self.button_items(btn, txt, 30)
+            # O menu aparece antes de terminar a carga das imagens e sons
+            if not ASSETS.done():
+                pct = int(ASSETS.progress() * 100)
+                items.append(text_item(f"carregando... {pct}%", 18, "gray", center=(WIDTH//2, HEIGHT - 20)))
+
+        elif game.state == STATE_PLAYING:
+            cam = game.camera
+            if FRAME_ATLAS.surface is None:
+                FRAME_ATLAS.build()  # Todos os frames num atlas so, antes do primeiro sprite
+            k = game.princess
+            if k is not None and not k.picked and in_view(k.x, k.y, cam):
+                items.append(sprite_item(k, cam))
+            items.append(sprite_item(game.player, cam))
+            # So os inimigos ativos (perto da tela) podem aparecer
+            for e in game.active_enemies:
+                if in_view(e.x, e.y, cam): items.append(sprite_item(e, cam))
+            items += projectile_items(game.projectiles, cam)
+
+            # UI
+            if game.player.lives != self.hud_lives:
+                self.hud_lives = game.player.lives
+                self.hud_item = text_item(f"VIDAS: {self.hud_lives}", 30, "red", topleft=(10, 10))
+            items.append(self.hud_item)
+
+            # Botoes UI
+            items += self.button_items(game.btn_home, "M")
+            items += self.button_items(game.btn_sound_small, "S")
+
+        elif game.state in (STATE_GAME_OVER, STATE_VICTORY):
+            msg = "VITORIA!" if game.state == STATE_VICTORY else "FIM DE JOGO"
+            color = "gold" if game.state == STATE_VICTORY else "red"
+            items.append(text_item(msg, 80, color, center=(WIDTH//2, HEIGHT//2)))
+
+            # Botao Back
+            items += self.button_items(game.btn_back, "Voltar ao Menu")
+            if game.state == STATE_GAME_OVER:
+                # Com a princesa ja pega, continua dali (checkpoint)
+                items += self.button_items(game.btn_retry, "Continuar" if game.checkpoint else "Tentar de novo")
+
+        if PROFILER.enabled:
+            items += self.profiler_overlay()
+        return items
+
+    def profiler_overlay(self):
+        self.overlay_age -= 1
+        if self.overlay_age > 0:
+            return self.overlay_items
+        self.overlay_age = 15
+        stats = PROFILER.summary()
+        lines = []
+        if stats:
+            lines.append(f"FPS {stats['fps']:.0f}  p50 {stats['p50_ms']:.1f}ms  p99 {stats['p99_ms']:.1f}ms")
+            parts = [f"{k.split('/')[-1]} {v:.2f}" for k, v in stats["subsystems"].items()]
+            for i in range(0, len(parts), 4):
+                lines.append("  ".join(parts[i:i + 4]))
+            lines.append("  ".join(f"{k} {v}" for k, v in stats["counts"].items()))
+        y = HEIGHT - 10 - 18 * len(lines)
+        self.overlay_items = [text_item(line, 18, "yellow", topleft=(10, y + 18 * i))
+                              for i, line in enumerate(lines)]
+        return self.overlay_items
+
+    def draw(self, game, target=None):
+        bg_key, bg = self.background(game)
+        items = self.scene(game)
+        if target is None:
+            target = pygame.display.get_surface()
+        # Com a camera parada o fundo eh o mesmo; se ela andou, redesenha tudo
+        if self.dirty_rects and bg_key == self.prev_bg_key and self.prev_items is not None:
+            self.dirty = self.redraw_changed(target, bg, items)
+        else:
+            # Mapa (pedacos visiveis da camada estatica) + sprites e UI, numa chamada
+            target.blits(bg + items, doreturn=False)
+            self.dirty = None
+            self.draw_calls = 1
+        self.prev_bg_key = bg_key
+        self.prev_items = items
+
+    def redraw_changed(self, target, bg, items):
+        """Redesenha so onde algo entrou, saiu, mudou ou trocou de ordem; devolve os rects sujos."""
+        prev_items = self.prev_items
+        if items == prev_items:
+            self.draw_calls = 0
+            return []
+        # Contagem (nao set): dois sprites iguais no mesmo lugar contam duas vezes
+        prev, cur = Counter(prev_items), Counter(items)
+        gone, added = prev - cur, cur - prev
+        changed = [item_rect(item) for item in gone + added]
+        # Ordem: entre os itens que continuam, quem nao esta na mesma posicao das duas
+        # listas pode ter trocado de camada com um vizinho (ex.: dois projeteis que se
+        # cruzam). Basta um dos dois do par: o rect dele cobre a area em comum
+        kept_prev = self.kept(prev_items, gone)
+        kept_cur = self.kept(items, added)
+        changed += [item_rect(a) for a, b in zip(kept_prev, kept_cur) if a != b]
+        scene = [(item, item_rect(item)) for item in bg + items]
+        calls = 0
+        for rect in changed:
+            target.set_clip(rect)
+            target.blits([item for item, r in scene if rect.colliderect(r)], doreturn=False)
+            calls += 1
+        target.set_clip(None)
+        self.draw_calls = calls
+        return changed
+
+    @staticmethod
+    def kept(items, dropped):
+        """`items` em ordem, sem uma ocorrencia de cada item contado em `dropped`."""
+        if not dropped:
+            return items
+        dropped = Counter(dropped)
+        out = []
+        for item in items:
+            if dropped[item]:
+                dropped[item] -= 1
+            else:
+                out.append(item)
+        return out
+
+    def present(self):
+        """Substitui o flip() do pgzero no modo dirty-rect."""
+        if self.dirty is None:
+            DISPLAY_FLIP()
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+        # Nada mudou: nao envia nada para a tela
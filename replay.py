@@ -0,0 +1,177 @@
+"""Gravacao deterministica de sessoes e replay rapido (headless).
+
+Uma gravacao guarda a seed do Game, o nivel, os cliques (com o tick em que
+aconteceram) e as teclas de cada tick num bitstream compactado (4 bits por
+tick). Com isso o replay reproduz a sessao exatamente pelo Game.step.
+
+Durante o replay sao guardados snapshots (Game.snapshot, alguns KB cada) a
+cada `snapshot_interval` ticks, entao `seek(tick)` custa no maximo um
+intervalo de simulacao.
+
+    STP_RECORD=sessao.stpr pgzrun game.py     # grava uma partida
+    python replay.py sessao.stpr              # replay no maximo de velocidade
+    python replay.py sessao.stpr --seek 5000  # estado no tick 5000
+"""
+import argparse
+import bisect
+import struct
+import sys
+import time
+import zlib
+
+from engine import Game, InputState
+
+MAGIC = b"STPR"
+VERSION = 1
+# magic, versao, seed, ticks, cliques, bytes do caminho do nivel
+HEADER = struct.Struct("<4sHqIIH")
+CLICK = struct.Struct("<Ihh")  # tick, x, y
+
+KEY_LEFT = 1
+KEY_RIGHT = 2
+KEY_SPACE = 4
+
+
+def pack_keys(inp):
+    return (KEY_LEFT if inp.left else 0) | (KEY_RIGHT if inp.right else 0) | (KEY_SPACE if inp.space else 0)
+
+def unpack_keys(bits):
+    return InputState(bool(bits & KEY_LEFT), bool(bits & KEY_RIGHT), bool(bits & KEY_SPACE))
+
+
+class Recording:
+    """Seed, nivel, cliques [(tick, (x, y))] e teclas de cada tick."""
+    def __init__(self, seed, level="", keys=None, clicks=None):
+        self.seed = seed
+        self.level = level or ""
+        self.keys = keys if keys is not None else bytearray()  # 1 valor (0-7) por tick
+        self.clicks = clicks if clicks is not None else []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def to_bytes(self):
+        keys = self.keys
+        packed = bytearray((len(keys) + 1) // 2)
+        for i in range(0, len(keys) - 1, 2):
+            packed[i // 2] = keys[i] | (keys[i + 1] << 4)
+        if len(keys) % 2:
+            packed[-1] = keys[-1]
+        level = self.level.encode("utf-8")
+        parts = [HEADER.pack(MAGIC, VERSION, self.seed, len(keys), len(self.clicks), len(level)), level]
+        parts += [CLICK.pack(t, x, y) for t, (x, y) in self.clicks]
+        parts.append(zlib.compress(bytes(packed), 9))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, n_ticks, n_clicks, level_len = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("arquivo de gravacao invalido")
+        off = HEADER.size
+        level = data[off:off + level_len].decode("utf-8")
+        off += level_len
+        clicks = []
+        for _ in range(n_clicks):
+            t, x, y = CLICK.unpack_from(data, off)
+            clicks.append((t, (x, y)))
+            off += CLICK.size
+        packed = zlib.decompress(data[off:])
+        keys = bytearray(n_ticks)
+        for i in range(n_ticks):
+            b = packed[i // 2]
+            keys[i] = (b >> 4) if i % 2 else (b & 0x0F)
+        return cls(seed, level, keys, clicks)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class Recorder:
+    """Gancho do Game (game.recorder) que grava cada tick e cada clique."""
+    def __init__(self, seed, level=""):
+        self.recording = Recording(seed, level)
+
+    def on_step(self, inp):
+        self.recording.keys.append(pack_keys(inp))
+
+    def on_click(self, pos):
+        # O clique vale a partir do proximo tick (o pgzero trata eventos antes do update)
+        self.recording.clicks.append((len(self.recording.keys), (int(pos[0]), int(pos[1]))))
+
+def start_recording(game, seed, level=""):
+    """Liga a gravacao num Game recem-criado com `seed`."""
+    game.recorder = Recorder(seed, level)
+    return game.recorder.recording
+
+
+class Replay:
+    """Reexecuta uma Recording pelo Game.step, com seek por snapshots."""
+    def __init__(self, recording, snapshot_interval=600):
+        self.recording = recording
+        self.snapshot_interval = snapshot_interval
+        self.game = Game(seed=recording.seed, level=recording.level or None)
+        self.tick = 0
+        self._click_ticks = [t for t, _ in recording.clicks]
+        self._snap_ticks = [0]
+        self._snaps = {0: self.game.snapshot()}
+
+    def step(self):
+        """Avanca um tick gravado; devolve False no fim da gravacao."""
+        rec = self.recording
+        if self.tick >= len(rec.keys):
+            return False
+        i = bisect.bisect_left(self._click_ticks, self.tick)
+        while i < len(self._click_ticks) and self._click_ticks[i] == self.tick:
+            self.game.on_mouse_down(rec.clicks[i][1])
+            i += 1
+        self.game.step(unpack_keys(rec.keys[self.tick]))
+        self.tick += 1
+        if self.tick % self.snapshot_interval == 0 and self.tick not in self._snaps:
+            self._snaps[self.tick] = self.game.snapshot()
+            bisect.insort(self._snap_ticks, self.tick)
+        return True
+
+    def run(self, until=None):
+        """Roda no maximo de velocidade ate `until` (ou o fim)."""
+        end = len(self.recording) if until is None else min(until, len(self.recording))
+        while self.tick < end and self.step():
+            pass
+        return self.game
+
+    def seek(self, tick):
+        """Vai para `tick` partindo do snapshot mais proximo antes dele."""
+        tick = max(0, min(tick, len(self.recording)))
+        base = self._snap_ticks[bisect.bisect_right(self._snap_ticks, tick) - 1]
+        # Se ja estamos entre o snapshot e o alvo, basta avancar
+        if not (base <= self.tick <= tick):
+            self.game.restore(self._snaps[base])
+            self.tick = base
+        return self.run(tick)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay headless de uma gravacao.")
+    parser.add_argument("path")
+    parser.add_argument("--seek", type=int, default=None, help="para no tick indicado")
+    parser.add_argument("--interval", type=int, default=600, help="ticks entre snapshots")
+    args = parser.parse_args(argv)
+
+    rec = Recording.load(args.path)
+    replay = Replay(rec, args.interval)
+    t0 = time.perf_counter()
+    game = replay.run(args.seek)
+    elapsed = time.perf_counter() - t0
+    p = getattr(game, "player", None)
+    print(f"tick {replay.tick}/{len(rec)} em {elapsed:.3f}s  estado={game.state}")
+    if p is not None:
+        print(f"player x={p.x:.1f} y={p.y:.1f} vidas={p.lives} carregando={p.carrying}")
+
+if __name__ == "__main__":
+    sys.exit(main())
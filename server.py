@@ -0,0 +1,521 @@
+"""Modo servidor: centenas de partidas (sessoes) num unico processo, com asyncio.
+
+Cada sessao eh um Game isolado, com RNG e fila de entrada proprios. Um unico
+laco de passo fixo avanca todas juntas a 60 Hz e manda para cada cliente so o
+que mudou (deltas) por um protocolo binario simples sobre TCP local. Os
+dados que nao mudam entre partidas (nivel, TileGrid, estado inicial) sao
+compartilhados, entao cada sessao custa poucos KB.
+
+Um tick custa ~25-30 us por sessao (quase tudo no Game.step: fisica do
+player e IA; codificar o delta fica em ~4 us). No teste de carga local um
+processo segura ~400 sessoes a 60 Hz; com 500 o tick ja ocupa os 16,7 ms
+e aparecem ticks descartados. Para milhares de partidas use --workers:
+cada processo roda o seu laco e o kernel distribui as conexoes entre eles.
+
+Protocolo (little-endian): cada mensagem eh FRAME (tamanho do corpo, tipo) +
+corpo. O cliente abre sessoes (MSG_OPEN), manda teclas (MSG_INPUT, bits do
+replay.py, uma entrada por tick na fila) e recebe MSG_DELTA nos ticks em
+que algo mudou: cabecalho, inimigos que se moveram e os projeteis que
+nasceram ou sumiram (o movimento deles o cliente calcula; ver SessionView).
+
+    python server.py --port 7777                # serve em 127.0.0.1:7777
+    python server.py --port 7777 --workers 4    # 4 processos na mesma porta (SO_REUSEPORT)
+    python server.py --load 400 --seconds 10    # teste de carga local (bots)
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from engine import (Game, TileGrid, FIXED_DT, MAX_STEPS_PER_UPDATE, DEFAULT_LEVEL, STATES,
+                    STATE_PLAYING)
+from level import load_level
+from profiler import _percentile
+from replay import KEY_LEFT, KEY_RIGHT, KEY_SPACE, unpack_keys
+
+HOST = "127.0.0.1"
+PORT = 7777
+INPUT_QUEUE = 8            # Entradas guardadas por sessao; alem disso descarta as mais antigas
+MAX_BUFFER = 256 * 1024    # Cliente lento: pula deltas enquanto o buffer de saida passar disso
+LAG_WINDOW = 600           # Ticks no historico das metricas
+STATS_INTERVAL = 5.0       # Segundos entre linhas de metricas no modo servidor
+
+FRAME = struct.Struct("<IB")  # tamanho do corpo, tipo
+MSG_OPEN = 1     # cliente: token, seed -> MSG_OPENED
+MSG_INPUT = 2    # cliente: sessao, teclas
+MSG_RESTART = 3  # cliente: sessao (comeca a partida de novo)
+MSG_CLOSE = 4    # cliente: sessao
+MSG_OPENED = 5   # servidor: token, sessao
+MSG_DELTA = 6    # servidor: ver encode_delta
+OPEN = struct.Struct("<Iq")
+OPENED = struct.Struct("<II")
+INPUT = struct.Struct("<IB")
+SESSION = struct.Struct("<I")
+# sessao, tick, estado, vidas, flags, x e y do player, inimigos que se moveram,
+# projeteis que nasceram e que sumiram
+DELTA_HEADER = struct.Struct("<IIBbBffHHH")
+DELTA_ENEMY = struct.Struct("<Iff")  # uid, x, y
+FLAG_CARRYING = 1
+FLAG_PICKED = 2
+FLAG_RESET = 4  # O cliente descarta os projeteis que conhece antes de aplicar o delta
+STATE_CODES = {state: i for i, state in enumerate(STATES)}
+NO_SERIALS = np.zeros(0, np.uint32)
+
+# Uma InputState por combinacao de teclas, reaproveitada por todas as sessoes
+INPUTS = tuple(unpack_keys(bits) for bits in range(8))
+
+
+def frame(kind, body=b""):
+    return FRAME.pack(len(body), kind) + body
+
+
+class Session:
+    """Um Game com a fila de entrada e o que ja foi mandado ao cliente."""
+    __slots__ = ("id", "game", "conn", "inputs", "keys", "sent", "last_header", "proj_known", "proj_next")
+
+    def __init__(self, sid, game, conn):
+        self.id = sid
+        self.game = game
+        self.conn = conn
+        self.inputs = deque(maxlen=INPUT_QUEUE)
+        self.keys = 0  # Sem entrada nova, repete as ultimas teclas
+        self.forget()
+
+    def forget(self):
+        """Esquece o que o cliente sabe: o proximo delta leva o estado completo."""
+        self.sent = {}  # uid -> (x, y) de cada inimigo no ultimo delta
+        self.last_header = None
+        self.proj_known = None  # Seriais dos projeteis que o cliente tem (None: nenhum estado)
+        self.proj_next = 0      # Seriais a partir daqui ainda nao foram mandados
+
+
+def encode_delta(session):
+    """Corpo do MSG_DELTA, ou None se nada mudou desde o ultimo.
+
+    Projeteis andam em linha reta com vx fixo, entao so nascimentos (serial,
+    posicao no tick do delta, vx, tipo) e remocoes (serial) sao mandados; o
+    cliente calcula o resto (ver SessionView).
+    """
+    game = session.game
+    p = game.player
+    k = game.princess
+    flags = (FLAG_CARRYING if p.carrying else 0) | (FLAG_PICKED if k is not None and k.picked else 0)
+    sent = session.sent
+    moved = []
+    # Com streaming a lista so tem os inimigos carregados; o uid identifica cada um
+    for e in game.enemies:
+        pos = (e.x, e.y)
+        if sent.get(e.uid) != pos:
+            sent[e.uid] = pos
+            moved.append(DELTA_ENEMY.pack(e.uid, e.x, e.y))
+
+    pool = game.projectiles
+    n = pool.count
+    known = session.proj_known
+    if known is None:
+        flags |= FLAG_RESET
+        start, removed = 0, NO_SERIALS
+    elif pool.next_serial == session.proj_next and n == len(known):
+        # Ninguem nasceu, entao a contagem igual quer dizer que ninguem sumiu
+        start, removed = n, NO_SERIALS
+    else:
+        serials = pool.serial[:n]
+        # Os vivos ficam em ordem de criacao: os ja mandados vem antes dos novos
+        start = int(np.searchsorted(serials, session.proj_next))
+        removed = np.setdiff1d(known, serials[:start], assume_unique=True) if start < len(known) else NO_SERIALS
+    spawned = n - start
+    if spawned or len(removed) or known is None:
+        session.proj_known = pool.serial[:n].copy()
+        session.proj_next = pool.next_serial
+
+    key = (game.state, p.lives, flags, p.x, p.y)
+    if not moved and not spawned and not len(removed) and key == session.last_header:
+        return None
+    session.last_header = key
+    parts = [DELTA_HEADER.pack(session.id, game.ticks, STATE_CODES[game.state], p.lives, flags,
+                               p.x, p.y, len(moved), spawned, len(removed))]
+    parts += moved
+    if spawned:
+        parts += (pool.serial[start:n].tobytes(), pool.x[start:n].astype(np.float32).tobytes(),
+                  pool.y[start:n].astype(np.float32).tobytes(), pool.vx[start:n].astype(np.float32).tobytes(),
+                  pool.kind[start:n].tobytes())
+    if len(removed):
+        parts.append(removed.tobytes())
+    return b"".join(parts)
+
+def decode_delta(body):
+    """Dict com o conteudo de um MSG_DELTA (lado do cliente)."""
+    sid, tick, state, lives, flags, x, y, n_moved, n_spawned, n_removed = DELTA_HEADER.unpack_from(body, 0)
+    off = DELTA_HEADER.size
+    moved = [DELTA_ENEMY.unpack_from(body, off + i * DELTA_ENEMY.size) for i in range(n_moved)]
+    off += n_moved * DELTA_ENEMY.size
+    n = n_spawned
+    serial = np.frombuffer(body, np.uint32, n, off)
+    px = np.frombuffer(body, np.float32, n, off + 4 * n)
+    py = np.frombuffer(body, np.float32, n, off + 8 * n)
+    vx = np.frombuffer(body, np.float32, n, off + 12 * n)
+    kind = np.frombuffer(body, np.int8, n, off + 16 * n)
+    removed = np.frombuffer(body, np.uint32, n_removed, off + 17 * n)
+    return {"session": sid, "tick": tick, "state": STATES[state], "lives": lives,
+            "carrying": bool(flags & FLAG_CARRYING), "picked": bool(flags & FLAG_PICKED),
+            "reset": bool(flags & FLAG_RESET), "player": (x, y), "enemies": moved,
+            "spawned": list(zip(serial.tolist(), px.tolist(), py.tolist(), vx.tolist(), kind.tolist())),
+            "removed": removed.tolist()}
+
+
+class SessionView:
+    """Estado de uma sessao do lado do cliente, montado aplicando os deltas em ordem."""
+    def __init__(self):
+        self.tick = 0
+        self.state = None
+        self.lives = 0
+        self.carrying = self.picked = False
+        self.player = (0.0, 0.0)
+        self.enemies = {}      # uid -> (x, y)
+        self.projectiles = {}  # serial -> (x, y, vx, tipo, tick em que x valia aquilo)
+
+    def apply(self, delta):
+        tick = self.tick = delta["tick"]
+        self.state, self.lives, self.player = delta["state"], delta["lives"], delta["player"]
+        self.carrying, self.picked = delta["carrying"], delta["picked"]
+        for uid, x, y in delta["enemies"]:
+            self.enemies[uid] = (x, y)
+        if delta["reset"]:
+            self.projectiles.clear()
+        for serial in delta["removed"]:
+            self.projectiles.pop(serial, None)
+        for serial, x, y, vx, kind in delta["spawned"]:
+            self.projectiles[serial] = (x, y, vx, kind, tick)
+
+    def projectiles_at(self, tick=None):
+        """[(x, y, tipo)] dos projeteis no tick dado (padrao: o do ultimo delta)."""
+        tick = self.tick if tick is None else tick
+        return [(x + vx * (tick - t0), y, kind) for x, y, vx, kind, t0 in self.projectiles.values()]
+
+
+class TickMetrics:
+    """Atraso de cada tick em relacao ao relogio ideal e custo do passo de todas as sessoes."""
+    def __init__(self, window=LAG_WINDOW):
+        self.lag_ms = deque(maxlen=window)
+        self.step_ms = deque(maxlen=window)
+        self.ticks = 0
+        self.dropped = 0      # Ticks descartados por atraso maior que MAX_STEPS_PER_UPDATE
+        self.skipped = 0      # Deltas nao mandados (cliente lento)
+        self.bytes_out = 0
+
+    def record(self, lag, cost):
+        self.ticks += 1
+        self.lag_ms.append(lag * 1e3)
+        self.step_ms.append(cost * 1e3)
+
+    def summary(self):
+        lag, step = list(self.lag_ms), list(self.step_ms)
+        return {"ticks": self.ticks, "lag_p50_ms": _percentile(lag, 0.5), "lag_p99_ms": _percentile(lag, 0.99),
+                "lag_max_ms": max(lag, default=0.0), "step_ms": sum(step) / len(step) if step else 0.0,
+                "step_p99_ms": _percentile(step, 0.99), "dropped": self.dropped, "skipped": self.skipped,
+                "bytes_out": self.bytes_out}
+
+
+class Connection:
+    """Um cliente TCP: sessoes dele e a saida acumulada no tick."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.sessions = set()
+        self.out = []
+
+
+class Server:
+    """Mantem as sessoes e as avanca juntas em passo fixo (ver run)."""
+    def __init__(self, level=None):
+        self.level = load_level(level or DEFAULT_LEVEL)
+        # Compartilhados: o nivel nao muda durante o jogo
+        self.tiles = TileGrid(self.level.cols, self.level.rows, self.level.tiles)
+        self.start_state = None  # Estado inicial do nivel, o mesmo para todas as sessoes
+        self.sessions = {}
+        self.connections = set()
+        self.next_id = 1
+        self.metrics = TickMetrics()
+        self.running = False
+
+    def open(self, seed, conn=None):
+        """Cria uma sessao ja jogando; devolve o id."""
+        game = Game(seed=seed, level=self.level)
+        game.tiles, game.tiles_level = self.tiles, self.level
+        game.start_state = self.start_state
+        game.start()
+        self.start_state = game.start_state
+        sid = self.next_id
+        self.next_id += 1
+        self.sessions[sid] = Session(sid, game, conn)
+        if conn is not None:
+            conn.sessions.add(sid)
+        return sid
+
+    def close(self, sid):
+        session = self.sessions.pop(sid, None)
+        if session is not None and session.conn is not None:
+            session.conn.sessions.discard(sid)
+
+    def push_input(self, sid, keys):
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.inputs.append(keys & (KEY_LEFT | KEY_RIGHT | KEY_SPACE))
+
+    def restart(self, sid):
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.game.start()
+
+    def step_all(self):
+        """Um tick de todas as sessoes (cada uma com a proxima entrada da fila)."""
+        for s in self.sessions.values():
+            if s.inputs:
+                s.keys = s.inputs.popleft()
+            s.game.step(INPUTS[s.keys])
+
+    def flush(self):
+        """Manda os deltas do tick, uma escrita por conexao."""
+        for s in self.sessions.values():
+            conn = s.conn
+            if conn is None:
+                continue
+            body = encode_delta(s)
+            if body is not None:
+                conn.out.append(frame(MSG_DELTA, body))
+        for conn in self.connections:
+            if conn.out:
+                data = b"".join(conn.out)
+                conn.out.clear()
+                if conn.writer.transport.get_write_buffer_size() > MAX_BUFFER:
+                    # O delta foi descartado: esquece o que encode_delta marcou como mandado,
+                    # para o proximo delta que sair levar o estado completo
+                    for sid in conn.sessions:
+                        self.sessions[sid].forget()
+                    self.metrics.skipped += 1
+                    continue
+                conn.writer.write(data)
+                self.metrics.bytes_out += len(data)
+
+    def dispatch(self, conn, kind, body):
+        if kind == MSG_INPUT:
+            sid, keys = INPUT.unpack(body)
+            if sid in conn.sessions:
+                self.push_input(sid, keys)
+        elif kind == MSG_OPEN:
+            token, seed = OPEN.unpack(body)
+            conn.writer.write(frame(MSG_OPENED, OPENED.pack(token, self.open(seed, conn))))
+        elif kind == MSG_RESTART:
+            sid, = SESSION.unpack(body)
+            if sid in conn.sessions:
+                self.restart(sid)
+        elif kind == MSG_CLOSE:
+            sid, = SESSION.unpack(body)
+            if sid in conn.sessions:
+                self.close(sid)
+
+    async def handle(self, reader, writer):
+        conn = Connection(writer)
+        self.connections.add(conn)
+        try:
+            while True:
+                size, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+                body = await reader.readexactly(size) if size else b""
+                self.dispatch(conn, kind, body)
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            self.connections.discard(conn)
+            for sid in list(conn.sessions):
+                self.close(sid)
+            writer.close()
+
+    async def run(self):
+        """Laco de passo fixo: recupera ate MAX_STEPS_PER_UPDATE ticks atrasados e descarta o resto."""
+        loop = asyncio.get_running_loop()
+        metrics = self.metrics
+        self.running = True
+        next_t = loop.time()
+        while self.running:
+            now = loop.time()
+            steps = 0
+            while next_t <= now and steps < MAX_STEPS_PER_UPDATE:
+                lag = loop.time() - next_t
+                t0 = time.perf_counter()
+                self.step_all()
+                self.flush()
+                metrics.record(lag, time.perf_counter() - t0)
+                next_t += FIXED_DT
+                steps += 1
+            if next_t <= now:
+                missed = int((now - next_t) / FIXED_DT) + 1
+                metrics.dropped += missed
+                next_t += missed * FIXED_DT
+            await asyncio.sleep(max(0.0, next_t - loop.time()))
+
+    def stop(self):
+        self.running = False
+
+    async def serve(self, host=HOST, port=PORT, reuse_port=False):
+        """Abre o socket (o laco eh o run, numa task a parte); devolve o asyncio.Server."""
+        return await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port or None)
+
+
+class Client:
+    """Cliente minimo do protocolo (bots, testes de carga)."""
+    def __init__(self):
+        self.reader = self.writer = None
+        self.pending = {}  # token -> Future(id da sessao)
+        self.next_token = 1
+        self.states = {}   # sessao -> SessionView (se keep_states)
+        self.finished = set()  # Sessoes cuja partida acabou (vitoria ou fim de jogo)
+        self.keep_states = True
+        self.deltas = 0
+        self.bytes_in = 0
+
+    async def connect(self, host=HOST, port=PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        asyncio.create_task(self._read())
+
+    async def open(self, seed):
+        token = self.next_token
+        self.next_token += 1
+        future = self.pending[token] = asyncio.get_running_loop().create_future()
+        self.writer.write(frame(MSG_OPEN, OPEN.pack(token, seed)))
+        return await future
+
+    def send_input(self, sid, keys):
+        self.writer.write(frame(MSG_INPUT, INPUT.pack(sid, keys)))
+
+    def restart(self, sid):
+        self.writer.write(frame(MSG_RESTART, SESSION.pack(sid)))
+
+    def close(self, sid):
+        self.writer.write(frame(MSG_CLOSE, SESSION.pack(sid)))
+
+    async def _read(self):
+        reader = self.reader
+        try:
+            while True:
+                size, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+                body = await reader.readexactly(size)
+                self.bytes_in += FRAME.size + size
+                if kind == MSG_DELTA:
+                    self.deltas += 1
+                    sid, _, state = DELTA_HEADER.unpack_from(body)[:3]
+                    if STATES[state] != STATE_PLAYING:
+                        self.finished.add(sid)
+                    if self.keep_states:
+                        view = self.states.get(sid)
+                        if view is None:
+                            view = self.states[sid] = SessionView()
+                        view.apply(decode_delta(body))
+                elif kind == MSG_OPENED:
+                    token, sid = OPENED.unpack(body)
+                    self.pending.pop(token).set_result(sid)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+# --- TESTE DE CARGA ---
+
+def session_memory(server, count=200):
+    """KB alocados por sessao nova (media de `count`)."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    ids = [server.open(10_000 + i) for i in range(count)]
+    per = (tracemalloc.get_traced_memory()[0] - base) / count / 1024
+    tracemalloc.stop()
+    for sid in ids:
+        server.close(sid)
+    return per
+
+async def run_load(sessions, seconds, level=None, port=0):
+    """Servidor + um cliente com `sessions` bots aleatorios pelo socket local."""
+    server = Server(level)
+    kb = session_memory(server)
+    server.metrics = TickMetrics(window=int(seconds / FIXED_DT) + 1)
+    listener = await server.serve(HOST, port)
+    client = Client()
+    client.keep_states = False
+    await client.connect(HOST, listener.sockets[0].getsockname()[1])
+    ids = await asyncio.gather(*(client.open(i) for i in range(sessions)))
+    ticker = asyncio.create_task(server.run())
+    rng = random.Random(0)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    while loop.time() < end:
+        for sid in client.finished:
+            client.restart(sid)
+        client.finished.clear()
+        # Cada bot troca de teclas ~3 vezes por segundo
+        for sid in ids:
+            if rng.random() < 0.05:
+                client.send_input(sid, rng.randrange(8))
+        await asyncio.sleep(FIXED_DT)
+    server.stop()
+    await ticker
+    client.writer.close()
+    await client.writer.wait_closed()
+    await asyncio.sleep(0.1)  # Deixa o handler do servidor ver a conexao fechada
+    listener.close()
+    await listener.wait_closed()
+    summary = server.metrics.summary()
+    summary.update(sessions=sessions, kb_per_session=kb, deltas=client.deltas,
+                   kb_per_s=client.bytes_in / seconds / 1024)
+    return summary
+
+async def serve_forever(host, port, level=None, reuse_port=False):
+    server = Server(level)
+    listener = await server.serve(host, port, reuse_port)
+    asyncio.create_task(server.run())
+    print(f"servindo em {host}:{port}")
+    async with listener:
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            stats = server.metrics.summary()
+            print(f"[{multiprocessing.current_process().name}] sessoes={len(server.sessions)} lag p50={stats['lag_p50_ms']:.1f} ms "
+                  f"p99={stats['lag_p99_ms']:.1f} ms passo={stats['step_ms']:.2f} ms "
+                  f"descartados={stats['dropped']}")
+
+def _serve_process(host, port, level, reuse_port):
+    try:
+        asyncio.run(serve_forever(host, port, level, reuse_port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de sessoes do Save The Princess.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--level", default=None, help="arquivo de nivel (padrao: levels/level1.txt)")
+    parser.add_argument("--workers", type=int, default=1, help="processos servindo a mesma porta")
+    parser.add_argument("--load", type=int, metavar="N", help="teste de carga com N sessoes e sai")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    if args.load:
+        summary = asyncio.run(run_load(args.load, args.seconds, args.level))
+        print(json.dumps(summary, indent=2))
+        return 0
+    reuse_port = args.workers > 1
+    procs = [multiprocessing.Process(target=_serve_process, name=f"worker-{i}",
+                                     args=(args.host, args.port, args.level, reuse_port))
+             for i in range(1, args.workers)]
+    for proc in procs:
+        proc.start()
+    _serve_process(args.host, args.port, args.level, reuse_port)
+    for proc in procs:
+        proc.join()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
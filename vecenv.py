@@ -0,0 +1,411 @@
+"""Ambiente vetorizado: N copias do mesmo nivel avancando juntas com NumPy.
+
+Para treinar bots: o estado das N partidas fica em arrays (player, maquinas
+de estado dos inimigos, projeteis) e cada `step` aplica a fisica do Player,
+a IA do FireEnemy/SwordEnemy, a coleta da princesa, o dano e a vitoria em
+todas de uma vez. O resultado bate tick a tick com o Game.step escalar
+(mesmas contas em float64, colisao de tiles na mesma ordem do
+TileGrid.solids_in). O RNG de cada copia eh um random.Random com a mesma
+seed que o Game teria, usado so pelos SwordEnemy que estao no alvo.
+
+So vale para niveis do tamanho da tela (sem camera nem agendador de IA:
+todos os inimigos rodam todo tick). Partidas que acabam recomecam sozinhas.
+
+    from vecenv import VecEnv
+    env = VecEnv(4096, seed=0)
+    obs = env.reset()
+    obs, reward, done, info = env.step(actions)  # actions: bits de teclas (replay.py)
+
+    python vecenv.py --envs 4096 --steps 500     # env-steps por segundo
+    python vecenv.py --check 64 --steps 3000     # compara com o Game escalar
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+import engine
+from engine import (BLOCK_SIZE, FIXED_DT, WIDTH, HEIGHT, ENT_PRINCESS, ENT_FIRE, ENT_SWORD,
+                    PROJ_FIREBALL, PROJ_SWORD, PROJECTILE_SIZE, SwordEnemy, TileGrid, walk_span)
+from replay import KEY_LEFT, KEY_RIGHT, KEY_SPACE, unpack_keys
+
+HALF_W, BODY_H = 15, 50  # Hitbox do Player.update
+PAD = 8                  # Linhas vazias acima do mapa (pulos acima da linha 0)
+PROJ_CAPACITY = 8        # Projeteis por copia (cresce se precisar)
+
+# Resultado de cada copia no tick (info["outcome"])
+OUT_PLAYING = 0
+OUT_VICTORY = 1
+OUT_GAME_OVER = 2
+
+REWARD_PICKUP = 1.0
+REWARD_VICTORY = 1.0
+REWARD_HIT = -0.5
+
+
+def _trunc(a):
+    """Arredondamento do pygame.Rect (trunca para zero) para indices inteiros."""
+    return np.trunc(a).astype(np.int64)
+
+
+class VecEnv:
+    """N partidas do mesmo nivel em arrays; `step` avanca todas um tick."""
+    def __init__(self, n, seed=0, level=None, seeds=None):
+        if level is None or isinstance(level, str):
+            from level import load_level
+            level = load_level(level or engine.DEFAULT_LEVEL)
+        self.level = level
+        self.n = n
+        self.world_w = max(level.cols * BLOCK_SIZE, WIDTH)
+        self.world_h = max(level.rows * BLOCK_SIZE, HEIGHT)
+        if self.world_w > WIDTH or self.world_h > HEIGHT:
+            raise ValueError("VecEnv so suporta niveis do tamanho da tela (sem rolagem)")
+        # Constantes lidas agora: respeitam sobrescritas do playtest (--set)
+        self.speed = engine.PLAYER_SPEED
+        self.speed_carry = engine.PLAYER_SPEED_CARRYING
+        self.grav = engine.GRAVITY
+        self.grav_carry = engine.GRAVITY_CARRYING
+        self.jump = engine.JUMP_STRENGTH
+
+        # Grid solido com bordas vazias (como o tile_at fora do mapa)
+        tiles = TileGrid(level.cols, level.rows, level.tiles)
+        self.gcols = max(level.cols, self.world_w // BLOCK_SIZE) + 2
+        self.grows = PAD + max(level.rows, self.world_h // BLOCK_SIZE) + 3
+        solid = np.zeros((self.grows, self.gcols), dtype=bool)
+        cells = np.frombuffer(bytes(tiles.cells), dtype=np.uint8).reshape(level.rows, level.cols)
+        solid[PAD:PAD + level.rows, :level.cols] = cells != 0
+        self.solid = solid.ravel()
+
+        # Entidades do nivel (mesma ordem do Game.reset_game)
+        fire, sword = [], []
+        self.princess = None
+        for kind, x, y in level.entities:
+            if kind == ENT_PRINCESS:
+                self.princess = (x, y)
+            elif kind in (ENT_FIRE, ENT_SWORD):
+                span = walk_span(tiles, x, y) or (x - BLOCK_SIZE // 2, x + BLOCK_SIZE // 2)
+                (fire if kind == ENT_FIRE else sword).append((x, y) + tuple(span))
+        if self.princess is None:
+            raise ValueError("VecEnv precisa de um nivel com princesa")
+        self.spawn_pos = level.spawn_pos if level.spawn_pos is not None else (100, 520)
+        self.spawn_rect = level.spawn_rect if level.spawn_rect is not None else (80, 520, 80, 40)
+        self.fire_x0 = np.array([f[0] for f in fire], dtype=np.float64)
+        self.fire_y = np.array([f[1] for f in fire], dtype=np.float64)
+        self.fire_min = np.array([f[2] for f in fire], dtype=np.float64)
+        self.fire_max = np.array([f[3] for f in fire], dtype=np.float64)
+        self.sword_x0 = np.array([s[0] for s in sword], dtype=np.float64)
+        self.sword_y = np.array([s[1] for s in sword], dtype=np.float64)
+        self.sword_span = [(s[2] + BLOCK_SIZE // 2, s[3] - BLOCK_SIZE // 2) for s in sword]
+
+        seeds = list(seeds) if seeds is not None else [seed + i for i in range(n)]
+        self.rngs = [random.Random(s) for s in seeds]
+        self._alloc_projectiles(PROJ_CAPACITY)
+        self.reset()
+
+    # --- estado ---
+
+    def _alloc_projectiles(self, capacity):
+        n = self.n
+        old = getattr(self, "p_alive", None)
+        arrays = (np.zeros((n, capacity)), np.zeros((n, capacity)), np.zeros((n, capacity)),
+                  np.zeros((n, capacity), dtype=np.int8), np.zeros((n, capacity), dtype=bool))
+        if old is not None:
+            k = old.shape[1]
+            for new, cur in zip(arrays, (self.p_x, self.p_y, self.p_vx, self.p_kind, self.p_alive)):
+                new[:, :k] = cur
+        self.p_x, self.p_y, self.p_vx, self.p_kind, self.p_alive = arrays
+
+    def reset(self, mask=None):
+        """Volta as copias de `mask` (todas se None) ao inicio do nivel; o RNG continua."""
+        if mask is None:
+            n, nf, ns = self.n, len(self.fire_x0), len(self.sword_x0)
+            self.x = np.zeros(n)
+            self.y = np.zeros(n)
+            self.vx = np.zeros(n)
+            self.vy = np.zeros(n)
+            self.on_ground = np.zeros(n, dtype=bool)
+            self.carrying = np.zeros(n, dtype=bool)
+            self.lives = np.zeros(n, dtype=np.int64)
+            self.invul = np.zeros(n)
+            self.ticks = np.zeros(n, dtype=np.int64)
+            self.fire_x = np.zeros((n, nf))
+            self.fire_state = np.zeros((n, nf), dtype=np.int8)
+            self.fire_timer = np.zeros((n, nf))
+            self.sword_x = np.zeros((n, ns))
+            self.sword_target = np.zeros((n, ns))
+            self.sword_timer = np.zeros((n, ns))
+            mask = np.ones(n, dtype=bool)
+        self.x[mask], self.y[mask] = self.spawn_pos
+        self.vx[mask] = self.vy[mask] = 0.0
+        self.on_ground[mask] = self.carrying[mask] = False
+        self.lives[mask] = 3
+        self.invul[mask] = 0.0
+        self.ticks[mask] = 0
+        self.fire_x[mask] = self.fire_x0
+        self.fire_state[mask] = 0
+        self.fire_timer[mask] = 0.0
+        self.sword_x[mask] = self.sword_x0
+        self.sword_target[mask] = self.sword_x0
+        self.sword_timer[mask] = 0.0
+        self.p_alive[mask] = False
+        return self.observe()
+
+    def observe(self):
+        """(N, 7 + 2 * inimigos) float32: player x, y, vy, no chao, carregando, vidas, invul e x dos inimigos."""
+        cols = [self.x, self.y, self.vy, self.on_ground, self.carrying, self.lives, self.invul]
+        return np.column_stack(cols + [self.fire_x, self.fire_state, self.sword_x, self.sword_target]).astype(np.float32)
+
+    def projectiles(self, i):
+        """(x, y, vx, tipo) dos projeteis vivos da copia i."""
+        alive = self.p_alive[i]
+        return list(zip(self.p_x[i, alive].tolist(), self.p_y[i, alive].tolist(),
+                        self.p_vx[i, alive].tolist(), self.p_kind[i, alive].tolist()))
+
+    # --- passo ---
+
+    def _cell(self, r, c):
+        r = np.clip(r + PAD, 0, self.grows - 1)
+        return self.solid[r * self.gcols + np.clip(c, 0, self.gcols - 1)]
+
+    def _player(self, left, right, space):
+        """Player.update de todas as copias (sem animacao)."""
+        bs = BLOCK_SIZE
+        carrying = self.carrying
+        speed = np.where(carrying, self.speed_carry, self.speed)
+        dx = np.where(left, -speed, np.where(right, speed, 0.0))
+        vy = self.vy + np.where(carrying, self.grav_carry, self.grav)
+
+        # Horizontal: tiles na ordem do solids_in (linha a linha), com o rect andando a cada batida
+        x = self.x + dx
+        x = np.where(x < HALF_W, float(HALF_W), x)
+        x = np.where(x > self.world_w - HALF_W, float(self.world_w - HALF_W), x)
+        left_px = _trunc(x - HALF_W)
+        top = _trunc(self.y - BODY_H)
+        c0, c1 = left_px // bs, (left_px + 2 * HALF_W - 1) // bs
+        r0, r1 = top // bs, (top + BODY_H - 1) // bs
+        moving = dx != 0
+        if moving.any():
+            right_snap = dx > 0
+            for k in range(3):
+                r = r0 + k
+                row_ok = moving & (r <= r1)
+                for j in range(2):
+                    c = c0 + j
+                    hit = row_ok & (c <= c1) & self._cell(r, c)
+                    hit &= (left_px < (c + 1) * bs) & (c * bs < left_px + 2 * HALF_W)
+                    if hit.any():
+                        x = np.where(hit, np.where(right_snap, c * bs - HALF_W, (c + 1) * bs + HALF_W), x)
+                        left_px = np.where(hit, _trunc(x - HALF_W), left_px)
+
+        # Vertical: pousa na primeira linha dentro da tolerancia, ou bate a cabeca
+        y = self.y + vy
+        left_px = _trunc(x - HALF_W)
+        top = _trunc(y - BODY_H)
+        c0, c1 = left_px // bs, (left_px + 2 * HALF_W - 1) // bs
+        r0, r1 = top // bs, (top + BODY_H - 1) // bs
+        two = c0 + 1 <= c1
+        y_prev = y - vy
+        on_ground = np.zeros(self.n, dtype=bool)
+        done = np.zeros(self.n, dtype=bool)
+        new_y, new_vy = y, vy
+        for k in range(3):
+            r = r0 + k
+            hit = (r <= r1) & ~done & (self._cell(r, c0) | (two & self._cell(r, c0 + 1)))
+            down = hit & (vy > 0) & (y_prev <= r * bs + 10)
+            up = hit & (vy < 0)
+            new_y = np.where(down, (r * bs).astype(np.float64), np.where(up, ((r + 1) * bs + BODY_H).astype(np.float64), new_y))
+            new_vy = np.where(down | up, 0.0, new_vy)
+            on_ground |= down
+            done |= down | up
+        y, vy = new_y, new_vy
+
+        # Chao do mundo (Safety net) e pulo
+        below = y > self.world_h
+        y = np.where(below, float(self.world_h), y)
+        vy = np.where(below, 0.0, vy)
+        on_ground |= below
+        vy = np.where(on_ground & space, float(self.jump), vy)
+
+        self.x, self.y, self.vy, self.on_ground = x, y, vy, on_ground
+        self.invul = np.where(self.invul > 0, self.invul - FIXED_DT, self.invul)
+
+    def _spawn(self, mask, x, y, vx, kind):
+        """Um projetil em cada copia de `mask`, no primeiro espaco livre."""
+        if not mask.any():
+            return
+        rows = np.flatnonzero(mask)
+        free = ~self.p_alive[rows]
+        if not free.any(axis=1).all():
+            self._alloc_projectiles(2 * self.p_alive.shape[1])
+            free = ~self.p_alive[rows]
+        slot = free.argmax(axis=1)
+        self.p_x[rows, slot] = x[rows]
+        self.p_y[rows, slot] = y
+        self.p_vx[rows, slot] = vx
+        self.p_kind[rows, slot] = kind
+        self.p_alive[rows, slot] = True
+
+    def _fire(self):
+        """FireEnemy.update_batch: anda, espera, atira para o lado em que estava indo."""
+        dt, step = FIXED_DT, FIXED_DT / FIXED_DT
+        for j in range(len(self.fire_x0)):
+            x, state = self.fire_x[:, j], self.fire_state[:, j]
+            t = self.fire_timer[:, j] + dt
+            s0, s1, s2, s3 = state == 0, state == 1, state == 2, state == 3
+            x = np.where(s0, np.minimum(x + step, self.fire_max[j]), x)
+            x = np.where(s2, np.maximum(x - step, self.fire_min[j]), x)
+            walk_end = (s0 | s2) & (t > 2.0)
+            shoot = (s1 | s3) & (t > 1.0)
+            self._spawn(s1 & shoot, x, self.fire_y[j], 5, PROJ_FIREBALL)
+            self._spawn(s3 & shoot, x, self.fire_y[j], -5, PROJ_FIREBALL)
+            change = walk_end | shoot
+            self.fire_state[:, j] = np.where(change, (state + 1) % 4, state)
+            self.fire_timer[:, j] = np.where(change, 0.0, t)
+            self.fire_x[:, j] = x
+
+    def _sword(self):
+        """SwordEnemy.update_batch: arremessa a cada 3 s e anda ate alvos sorteados no chao."""
+        dt = FIXED_DT
+        ticks = dt / FIXED_DT
+        speed = SwordEnemy.SPEED * ticks
+        chance = 1 - (1 - SwordEnemy.RETARGET_CHANCE) ** ticks
+        for j in range(len(self.sword_x0)):
+            x, target = self.sword_x[:, j], self.sword_target[:, j]
+            t = self.sword_timer[:, j] + dt
+            throw = t > 3.0
+            self.sword_timer[:, j] = np.where(throw, 0.0, t)
+            self._spawn(throw, x, self.sword_y[j], -6, PROJ_SWORD)
+            at = np.abs(x - target) < 5
+            # O sorteio usa o RNG de cada copia, na mesma ordem do Game
+            lo, hi = self.sword_span[j]
+            rngs = self.rngs
+            for i in np.flatnonzero(at).tolist():
+                rng = rngs[i]
+                if rng.random() < chance:
+                    target[i] = rng.randint(lo, hi)
+            self.sword_x[:, j] = np.where(at, x, x + np.maximum(-speed, np.minimum(speed, target - x)))
+
+    def step(self, actions):
+        """Um tick de todas as copias; `actions` sao bits KEY_LEFT/KEY_RIGHT/KEY_SPACE por copia.
+
+        Devolve (obs, reward, done, info); as copias com done ja recomecaram
+        e info["outcome"] diz como acabaram (OUT_VICTORY ou OUT_GAME_OVER).
+        """
+        actions = np.asarray(actions)
+        left = (actions & KEY_LEFT) != 0
+        right = ~left & ((actions & KEY_RIGHT) != 0)
+        space = (actions & KEY_SPACE) != 0
+        self.ticks += 1
+        self._player(left, right, space)
+        self._fire()
+        self._sword()
+        # Projeteis andam e somem fora do mundo
+        self.p_x += self.p_vx
+        self.p_alive &= (self.p_x >= 0) & (self.p_x <= self.world_w)
+
+        # Colisoes (mesmas caixas do Game.collide)
+        x, y = self.x, self.y
+        pl, pt = _trunc(x - 15), _trunc(y - 25)
+        pr, pb = pl + 30, pt + 50
+        kx, ky = self.princess
+        kl, kt = int(kx - 50), int(ky - 50)
+        near = (pl < kl + 100) & (kl < pr) & (pt < kt + 100) & (kt < pb)
+        picked = near & ~self.carrying & (np.sqrt((x - kx) ** 2 + (y - ky) ** 2) < 50)
+        self.carrying = self.carrying | picked
+        enemy_hit = np.zeros(self.n, dtype=bool)
+        for ex, ey in ((self.fire_x, self.fire_y), (self.sword_x, self.sword_y)):
+            if ex.shape[1]:
+                el, et = _trunc(ex - 20), _trunc(ey - 20)
+                enemy_hit |= ((pl[:, None] < el + 40) & (el < pr[:, None]) &
+                              (pt[:, None] < et + 40) & (et < pb[:, None])).any(axis=1)
+        half = PROJECTILE_SIZE // 2
+        bl, bt = _trunc(self.p_x - half), _trunc(self.p_y - half)
+        proj = (self.p_alive & (pl[:, None] < bl + PROJECTILE_SIZE) & (bl < pr[:, None]) &
+                (pt[:, None] < bt + PROJECTILE_SIZE) & (bt < pb[:, None]))
+        self.p_alive &= ~proj
+        hit = (enemy_hit | proj.any(axis=1)) & (self.invul <= 0)
+        self.lives = self.lives - hit
+        self.invul = np.where(hit, 1.0, self.invul)
+
+        # Vitoria (rect 10x10 nos pes) e fim de jogo, que tem prioridade
+        sx, sy, sw, sh = self.spawn_rect
+        ix, iy = _trunc(x), _trunc(y)
+        victory = self.carrying & (ix < sx + sw) & (sx < ix + 10) & (iy < sy + sh) & (sy < iy + 10)
+        over = self.lives <= 0
+        outcome = np.where(over, OUT_GAME_OVER, np.where(victory, OUT_VICTORY, OUT_PLAYING))
+        done = outcome != OUT_PLAYING
+        reward = picked * REWARD_PICKUP + (victory & ~over) * REWARD_VICTORY + hit * REWARD_HIT
+        info = {"outcome": outcome, "ticks": self.ticks.copy()}
+        if done.any():
+            self.reset(done)
+        return self.observe(), reward, done, info
+
+
+# --- CLI ---
+
+def check(envs, steps, seed=0, level=None):
+    """Roda VecEnv e N Game escalares com as mesmas acoes; devolve o primeiro tick divergente (ou None)."""
+    env = VecEnv(envs, seed, level)
+    games = [engine.Game(seed=seed + i, level=env.level) for i in range(envs)]
+    for g in games:
+        g.start()
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, 8, envs)
+    for t in range(steps):
+        change = rng.random(envs) < 0.1
+        actions = np.where(change, rng.integers(0, 8, envs), actions)
+        _, _, done, info = env.step(actions)
+        for i, g in enumerate(games):
+            g.step(unpack_keys(int(actions[i])))
+            if g.state != engine.STATE_PLAYING:
+                expect = OUT_VICTORY if g.state == engine.STATE_VICTORY else OUT_GAME_OVER
+                if not done[i] or info["outcome"][i] != expect:
+                    return t, i, "fim de partida"
+                g.start()
+            elif done[i]:
+                return t, i, "fim de partida"
+            p = g.player
+            mine = (env.x[i], env.y[i], env.vy[i], env.on_ground[i], env.carrying[i], env.lives[i], env.invul[i])
+            if mine != (p.x, p.y, p.vy, p.on_ground, p.carrying, p.lives, p.invul_timer):
+                return t, i, "player"
+            fires = [e for e in g.enemies if isinstance(e, engine.FireEnemy)]
+            swords = [e for e in g.enemies if isinstance(e, engine.SwordEnemy)]
+            if ([(e.x, e.state, e.timer_action) for e in fires] !=
+                    list(zip(env.fire_x[i].tolist(), env.fire_state[i].tolist(), env.fire_timer[i].tolist()))):
+                return t, i, "fire"
+            if ([(e.x, e.target_x, e.timer_action) for e in swords] !=
+                    list(zip(env.sword_x[i].tolist(), env.sword_target[i].tolist(), env.sword_timer[i].tolist()))):
+                return t, i, "sword"
+            if sorted(g.projectiles.items()) != sorted((px, py, k) for px, py, _, k in env.projectiles(i)):
+                return t, i, "projeteis"
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ambiente vetorizado do Save The Princess.")
+    parser.add_argument("--envs", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--level", default=None, help="arquivo de nivel (padrao: levels/level1.txt)")
+    parser.add_argument("--check", type=int, metavar="N", help="compara N copias com o Game escalar")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        bad = check(args.check, args.steps, level=args.level)
+        print("ok" if bad is None else f"diverge no tick {bad[0]}, copia {bad[1]}: {bad[2]}")
+        return 0 if bad is None else 1
+    env = VecEnv(args.envs, level=args.level)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 8, (args.steps, args.envs))
+    t0 = time.perf_counter()
+    wins = 0
+    for a in actions:
+        _, _, done, info = env.step(a)
+        wins += int((info["outcome"] == OUT_VICTORY).sum())
+    elapsed = time.perf_counter() - t0
+    print(f"{args.envs * args.steps / elapsed:,.0f} env-steps/s ({args.envs} copias x {args.steps} ticks, "
+          f"{elapsed:.2f} s, {wins} vitorias)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())